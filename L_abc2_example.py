@@ -1,4 +1,5 @@
-from qutip import basis, tensor, ket2dm, ptrace, partial_transpose
+# basis/tensor/... из backend.py: NumPy по умолчанию, QUANTUM_BACKEND=qutip - QuTiP
+from backend import basis, tensor, ket2dm, ptrace, partial_transpose
 import numpy as np
 
 q0 = basis(2, 0)
@@ -0,0 +1,96 @@
+import numpy as np
+
+# аналитические ядра для маленьких матриц, векторизованы по батчу (...)
+
+
+# определитель батча матриц 2x2
+def det2(m):
+    return m[..., 0, 0] * m[..., 1, 1] - m[..., 0, 1] * m[..., 1, 0]
+
+
+# определитель батча матриц 4x4 разложением Лапласа по первым двум строкам:
+# det = sum(+-) minor_top(i, j) * minor_bottom(дополнение i, j)
+def det4(m):
+    a = m[..., 0, :]
+    b = m[..., 1, :]
+    c = m[..., 2, :]
+    d = m[..., 3, :]
+
+    def top(i, j):
+        return a[..., i] * b[..., j] - a[..., j] * b[..., i]
+
+    def bottom(i, j):
+        return c[..., i] * d[..., j] - c[..., j] * d[..., i]
+
+    return (top(0, 1) * bottom(2, 3) - top(0, 2) * bottom(1, 3) + top(0, 3) * bottom(1, 2)
+            + top(1, 2) * bottom(0, 3) - top(1, 3) * bottom(0, 2) + top(2, 3) * bottom(0, 1))
+
+
+# собственные числа батча эрмитовых 2x2 (по возрастанию) из следа и определителя:
+# lambda = t/2 -+ sqrt(t^2/4 - det); подкоренное выражение записано как ((m00-m11)/2)^2 + |m01|^2,
+# чтобы не терять точность на вычитании
+def eigvals2_hermitian(m):
+    half_trace = (m[..., 0, 0].real + m[..., 1, 1].real) / 2.0
+    radius = np.hypot((m[..., 0, 0].real - m[..., 1, 1].real) / 2.0, np.abs(m[..., 0, 1]))
+    return np.stack([half_trace - radius, half_trace + radius], axis=-1)
+
+
+# частичное транспонирование по второму кубиту для батча 4x4
+def partial_transpose_b(rho):
+    shape = rho.shape
+    t = rho.reshape(shape[:-2] + (2, 2, 2, 2))
+    return t.swapaxes(-3, -1).reshape(shape)
+
+
+# PPT тест для двух кубитов: у rho^{T_B} не больше одного отрицательного собственного числа,
+# поэтому оно есть тогда и только тогда, когда det(rho^{T_B}) < 0.
+# возвращает (entangled, uncertain, det): uncertain - |det| <= tol, там нужен общий солвер
+def ppt_det_test(rho_pairs, tol=1e-9):
+    det = det4(partial_transpose_b(rho_pairs)).real
+    uncertain = np.abs(det) <= tol
+    entangled = det < -tol
+    return entangled, uncertain, det
+
+
+# коэффициенты характеристического многочлена 4x4: l^4 - e1 l^3 + e2 l^2 - e3 l + e4
+# (тождества Ньютона по следам степеней матрицы)
+def charpoly4(m):
+    m2 = m @ m
+    p1 = np.trace(m, axis1=-2, axis2=-1).real
+    p2 = np.trace(m2, axis1=-2, axis2=-1).real
+    p3 = np.einsum('...ij,...ji->...', m2, m).real
+    e1 = p1
+    e2 = (e1 * p1 - p2) / 2.0
+    e3 = (e2 * p1 - e1 * p2 + p3) / 3.0
+    e4 = det4(m).real
+    return e1, e2, e3, e4
+
+
+# точное отрицательное собственное число rho^{T_B} (0 там, где det >= 0).
+# единственный отрицательный корень характеристического многочлена лежит в [-Tr/2, 0):
+# бисекция по всему батчу сразу, затем несколько шагов Ньютона для полировки
+def negative_pt_eigenvalue(rho_pairs, iterations=30):
+    pt = partial_transpose_b(rho_pairs)
+    e1, e2, e3, e4 = charpoly4(pt)
+
+    def poly(x):
+        return (((x - e1) * x + e2) * x - e3) * x + e4
+
+    def dpoly(x):
+        return ((4.0 * x - 3.0 * e1) * x + 2.0 * e2) * x - e3
+
+    negative = e4 < 0
+    lo = np.where(negative, -e1 / 2.0, 0.0)
+    hi = np.zeros_like(lo)
+    # p(lo) >= 0, p(hi) = det < 0
+    for _ in range(iterations):
+        mid = (lo + hi) / 2.0
+        above = poly(mid) >= 0
+        lo = np.where(above, mid, lo)
+        hi = np.where(above, hi, mid)
+    root = (lo + hi) / 2.0
+    for _ in range(3):
+        slope = dpoly(root)
+        step = np.divide(poly(root), slope, out=np.zeros_like(root), where=slope != 0)
+        root = np.clip(root - step, lo, hi)
+    return np.where(negative, root, 0.0)
@@ -0,0 +1,207 @@
+import os
+import string
+
+import numpy as np
+
+# бэкенд для basis/tensor/ket2dm/ptrace/partial_transpose: "numpy" (по умолчанию, без импорта qutip)
+# или "qutip". Выбирается переменной окружения QUANTUM_BACKEND или use_backend() во время работы
+ENV_BACKEND = "QUANTUM_BACKEND"
+BACKENDS = ("numpy", "qutip")
+
+_backend = "numpy"
+
+
+# минимальная замена qutip.Qobj для небольших систем кубитов: плотная матрица data
+# (кет - столбец (n, 1)) и dims в формате qutip: [[d1, d2, ...], [1]] или [[d1, d2, ...], [d1, d2, ...]]
+class NumpyQobj:
+    __array_priority__ = 100
+
+    def __init__(self, data, dims=None):
+        data = np.asarray(data, dtype=complex)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        self.data = data
+        if dims is None:
+            dims = [[data.shape[0]], [data.shape[1]]]
+        self.dims = [list(dims[0]), list(dims[1])]
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def isket(self):
+        return self.data.shape[1] == 1
+
+    @property
+    def isoper(self):
+        return self.data.shape[0] == self.data.shape[1]
+
+    def __repr__(self):
+        kind = "ket" if self.isket else "oper"
+        return f"NumpyQobj(dims={self.dims}, shape={self.shape}, type={kind})\n{self.data}"
+
+    def _wrap(self, data):
+        return NumpyQobj(data, self.dims)
+
+    def __add__(self, other):
+        if isinstance(other, NumpyQobj):
+            return self._wrap(self.data + other.data)
+        return self._wrap(self.data + other * np.eye(*self.shape))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __neg__(self):
+        return self._wrap(-self.data)
+
+    def __mul__(self, other):
+        if isinstance(other, NumpyQobj):
+            return NumpyQobj(self.data @ other.data, [self.dims[0], other.dims[1]])
+        return self._wrap(self.data * other)
+
+    def __rmul__(self, other):
+        return self._wrap(other * self.data)
+
+    def __truediv__(self, other):
+        return self._wrap(self.data / other)
+
+    def __matmul__(self, other):
+        return self * other
+
+    def full(self):
+        return self.data.copy()
+
+    def dag(self):
+        return NumpyQobj(self.data.conj().T, [self.dims[1], self.dims[0]])
+
+    def tr(self):
+        value = np.trace(self.data)
+        return value.real if abs(value.imag) < 1e-12 else value
+
+    # норма как в qutip: евклидова для кета, следовая (сумма сингулярных чисел) для оператора
+    def norm(self):
+        if self.isket:
+            return float(np.linalg.norm(self.data))
+        return float(np.sum(np.linalg.svd(self.data, compute_uv=False)))
+
+    def unit(self):
+        return self / self.norm()
+
+    def eigenenergies(self):
+        if np.allclose(self.data, self.data.conj().T):
+            return np.linalg.eigvalsh(self.data)
+        return np.sort_complex(np.linalg.eigvals(self.data))
+
+    def ptrace(self, sel):
+        return ptrace(self, sel)
+
+
+def use_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"неизвестный бэкенд: {name}; доступны: {', '.join(BACKENDS)}")
+    _backend = name
+
+
+def current_backend():
+    return _backend
+
+
+use_backend(os.environ.get(ENV_BACKEND, "numpy"))
+
+
+# qutip (а с ним scipy) импортируется только при выборе бэкенда qutip
+def _qutip():
+    import qutip
+    return qutip
+
+
+def basis(dim, n=0):
+    if _backend == "qutip":
+        return _qutip().basis(dim, n)
+    data = np.zeros((dim, 1), dtype=complex)
+    data[n, 0] = 1
+    return NumpyQobj(data, [[dim], [1]])
+
+
+def tensor(*states):
+    if len(states) == 1 and isinstance(states[0], (list, tuple)):
+        states = states[0]
+    if _backend == "qutip":
+        return _qutip().tensor(*states)
+    data = states[0].data
+    dims = [list(states[0].dims[0]), list(states[0].dims[1])]
+    for state in states[1:]:
+        data = np.kron(data, state.data)
+        dims[0] += state.dims[0]
+        dims[1] += state.dims[1]
+    if data.shape[1] == 1:
+        # у кета qutip хранит dims [[...], [1]]
+        dims[1] = [1]
+    return NumpyQobj(data, dims)
+
+
+def ket2dm(psi):
+    if _backend == "qutip":
+        return _qutip().ket2dm(psi)
+    return NumpyQobj(psi.data @ psi.data.conj().T, [psi.dims[0], psi.dims[0]])
+
+
+# кет из вектора амплитуд; dims по умолчанию - кубиты
+def ket(amplitudes, dims=None):
+    amplitudes = np.asarray(amplitudes, dtype=complex).reshape(-1, 1)
+    if dims is None:
+        dims = [2] * int(round(np.log2(len(amplitudes))))
+    if _backend == "qutip":
+        return _qutip().Qobj(amplitudes, dims=[list(dims), [1] * len(dims)])
+    return NumpyQobj(amplitudes, [list(dims), [1]])
+
+
+# частичный след: остаются подсистемы sel (в порядке возрастания, как в qutip); для кета -
+# через матрицу бипартиции M M^+, без матрицы плотности всей системы
+def ptrace(state, sel):
+    if _backend == "qutip":
+        return _qutip().ptrace(state, sel)
+    sel = sorted({sel} if isinstance(sel, (int, np.integer)) else set(sel))
+    dims = state.dims[0]
+    n = len(dims)
+    rest = [q for q in range(n) if q not in sel]
+    kept_dims = [dims[q] for q in sel]
+    dim = int(np.prod(kept_dims))
+    if state.isket:
+        psi = state.data.reshape(dims).transpose(sel + rest).reshape(dim, -1)
+        data = psi @ psi.conj().T
+    else:
+        letters = string.ascii_letters
+        ket_idx = letters[:n]
+        bra_idx = ''.join(letters[n + q] if q in sel else ket_idx[q] for q in range(n))
+        out = ''.join(ket_idx[q] for q in sel) + ''.join(bra_idx[q] for q in sel)
+        data = np.einsum(f'{ket_idx}{bra_idx}->{out}', state.data.reshape(dims + dims)).reshape(dim, dim)
+    return NumpyQobj(data, [kept_dims, kept_dims])
+
+
+# частичное транспонирование подсистем с mask[i] = 1
+def partial_transpose(rho, mask):
+    if _backend == "qutip":
+        return _qutip().partial_transpose(rho, mask)
+    if rho.isket:
+        rho = ket2dm(rho)
+    dims = rho.dims[0]
+    n = len(dims)
+    axes = list(range(2 * n))
+    for q, flag in enumerate(mask):
+        if flag:
+            axes[q], axes[n + q] = n + q, q
+    data = rho.data.reshape(dims + dims).transpose(axes).reshape(rho.shape)
+    return NumpyQobj(data, rho.dims)
+
+
+def eigenenergies(state):
+    return state.eigenenergies()
+
+
+def to_array(state):
+    return state.full() if hasattr(state, 'full') else np.asarray(state)
@@ -0,0 +1,361 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from analytic import partial_transpose_b, ppt_det_test
+from families import get_family
+from quantum_tools import entropy
+from sqlite_db import SQLiteExperimentDB
+from sweep import SUBSYSTEMS, analyze_batch, analyze_state, density_matrices, point_results, ptrace_batch
+
+DEFAULT_SIZES = (1, 10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6)
+
+# регрессия - этап медленнее baseline больше чем на 20%
+DEFAULT_THRESHOLD = 0.2
+
+# разница меньше 50 мкс считается шумом таймера и регрессией не считается
+DEFAULT_MIN_DELTA = 5e-5
+
+# старт интерпретатора + импорт скриптов + анализ одной точки на бэкенде numpy, секунды
+DEFAULT_STARTUP_LIMIT = 1.0
+
+# тяжёлые модули, которые не должны загружаться при коротком запуске на бэкенде numpy
+HEAVY_MODULES = ("qutip", "scipy", "matplotlib", "psycopg2")
+
+STARTUP_CODE = """
+import json, sys
+import G_abcd_with_db, L_abc2_with_db
+from sweep import analyze_state, point_results
+point_results(analyze_state(G_abcd_with_db.build_g_abcd(1.0, 0.5, 0.0, 0.0)), 0)
+point_results(analyze_state(L_abc2_with_db.build_l_abc2(1.0, 0.5, 0.0)), 0)
+print(json.dumps([name for name in sys.argv[1:] if name in sys.modules]))
+"""
+
+# этап, который на предыдущем размере шёл дольше, на больших размерах не запускается
+DEFAULT_TIME_BUDGET = 10.0
+
+
+# этап конвейера: setup(size, rng) готовит входные данные (не входит в замер), run(data) - замеряемая работа.
+# max_size ограничивает поточечные этапы QuTiP и батчи матриц 16x16 (память ~ 4 КБ на точку)
+class Stage:
+    def __init__(self, name, setup, run, max_size=None, requires=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.max_size = max_size
+        self.requires = requires
+
+    def available(self):
+        if self.requires is None:
+            return True
+        try:
+            __import__(self.requires)
+        except ImportError:
+            return False
+        return True
+
+
+STAGES = {}
+
+
+def add_stage(name, setup, run, max_size=None, requires=None):
+    STAGES[name] = Stage(name, setup, run, max_size, requires)
+
+
+def _params(family, size, rng):
+    return rng.normal(size=(size, len(get_family(family).parameters)))
+
+
+def _amps(size, rng):
+    return get_family("G_abcd").amplitudes(_params("G_abcd", size, rng))
+
+
+def _kets(size, rng):
+    family = get_family("G_abcd")
+    return [family.qobj(p) for p in _params("G_abcd", size, rng)]
+
+
+def _dms(size, rng):
+    from qutip import ket2dm
+    return [ket2dm(psi) for psi in _kets(size, rng)]
+
+
+def _pair_dms(size, rng):
+    from qutip import ptrace
+    return [ptrace(rho, [0, 1]) for rho in _dms(size, rng)]
+
+
+def _single_spectra(size, rng):
+    from qutip import ptrace
+    return [ptrace(rho, [q]).eigenenergies() for rho in _dms(size, rng) for q in range(4)]
+
+
+def _build_each(family):
+    def run(params):
+        family_ = get_family(family)
+        for p in params:
+            family_.qobj(p)
+    return run
+
+
+def _ket2dm_each(kets):
+    from qutip import ket2dm
+    for psi in kets:
+        ket2dm(psi)
+
+
+def _ptrace_single_each(dms):
+    from qutip import ptrace
+    for rho in dms:
+        for q in range(4):
+            ptrace(rho, [q])
+
+
+def _ptrace_pair_each(dms):
+    from qutip import ptrace
+    for rho in dms:
+        for keep in SUBSYSTEMS.values():
+            ptrace(rho, list(keep))
+
+
+def _eigenenergies_each(pairs):
+    for rho in pairs:
+        rho.eigenenergies()
+
+
+def _partial_transpose_each(pairs):
+    from qutip import partial_transpose
+    for rho in pairs:
+        partial_transpose(rho, [0, 1])
+
+
+def _entropy_each(spectra):
+    for ev in spectra:
+        entropy(ev)
+
+
+def _analyze_each(kets):
+    for psi in kets:
+        point_results(analyze_state(psi), 0)
+
+
+def _ptrace_single_batch(rho):
+    for q in range(4):
+        ptrace_batch(rho, (q,))
+
+
+def _ptrace_pair_batch(rho):
+    for keep in SUBSYSTEMS.values():
+        ptrace_batch(rho, keep)
+
+
+def _pair_batch(size, rng):
+    return ptrace_batch(density_matrices(_amps(size, rng)), (0, 1))
+
+
+def _records(size, rng):
+    params = _params("G_abcd", size, rng)
+    batch = analyze_batch(get_family("G_abcd").amplitudes(params))
+    return [
+        (dict(zip("abcd", map(float, p))), point_results(batch, i), 'completed')
+        for i, p in enumerate(params)
+    ]
+
+
+# запись в локальную SQLite-заглушку вместо сервера PostgreSQL: каждый замер в новом файле
+def _db_write(method):
+    def run(records):
+        with tempfile.TemporaryDirectory() as tmp:
+            with SQLiteExperimentDB(os.path.join(tmp, "bench.sqlite")) as db:
+                if method == "single":
+                    for parameters, results, status in records:
+                        experiment_id = db.save_experiment("bench", "benchmark", parameters)
+                        db.update_status(experiment_id, status, results)
+                else:
+                    db.save_experiments_bulk(records, "bench", "benchmark")
+    return run
+
+
+# короткий запуск в отдельном интерпретаторе: время и список загруженных тяжёлых модулей
+def measure_startup():
+    env = dict(os.environ, QUANTUM_BACKEND="numpy")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", STARTUP_CODE, *HEAVY_MODULES], env=env, check=True,
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return time.perf_counter() - start, json.loads(output.splitlines()[-1])
+
+
+# проверка быстрого старта (tests/test_startup.py, bench.py --check-startup): нарушения - пустой список, если всё в порядке
+def check_startup(limit=DEFAULT_STARTUP_LIMIT, repeat=3):
+    seconds, heavy = min(measure_startup() for _ in range(repeat))
+    problems = []
+    if heavy:
+        problems.append(f"при старте загружены тяжёлые модули: {', '.join(heavy)}")
+    if seconds > limit:
+        problems.append(f"старт занял {seconds:.3f} с (лимит {limit:.3f} с)")
+    return seconds, problems
+
+
+# поточечный путь QuTiP, как в *_example.py: одна точка - отдельные вызовы на Qobj
+add_stage("qutip.build_g_abcd", lambda n, rng: _params("G_abcd", n, rng), _build_each("G_abcd"),
+          10 ** 4, "qutip")
+add_stage("qutip.build_l_abc2", lambda n, rng: _params("L_abc2", n, rng), _build_each("L_abc2"),
+          10 ** 4, "qutip")
+add_stage("qutip.ket2dm", _kets, _ket2dm_each, 10 ** 4, "qutip")
+add_stage("qutip.ptrace_single", _dms, _ptrace_single_each, 10 ** 4, "qutip")
+add_stage("qutip.ptrace_pair", _dms, _ptrace_pair_each, 10 ** 4, "qutip")
+add_stage("qutip.eigenenergies", _pair_dms, _eigenenergies_each, 10 ** 4, "qutip")
+add_stage("qutip.partial_transpose", _pair_dms, _partial_transpose_each, 10 ** 4, "qutip")
+add_stage("entropy.single", _single_spectra, _entropy_each, 10 ** 4, "qutip")
+add_stage("analyze_state", _kets, _analyze_each, 10 ** 4, "qutip")
+
+# батчевый путь NumPy (sweep.py / analytic.py)
+add_stage("batch.build_g_abcd", lambda n, rng: _params("G_abcd", n, rng), get_family("G_abcd").amplitudes)
+add_stage("batch.build_l_abc2", lambda n, rng: _params("L_abc2", n, rng), get_family("L_abc2").amplitudes)
+add_stage("batch.ket2dm", _amps, density_matrices, 10 ** 5)
+add_stage("batch.ptrace_single", lambda n, rng: density_matrices(_amps(n, rng)), _ptrace_single_batch, 10 ** 5)
+add_stage("batch.ptrace_pair", lambda n, rng: density_matrices(_amps(n, rng)), _ptrace_pair_batch, 10 ** 5)
+add_stage("batch.eigvalsh", _pair_batch, np.linalg.eigvalsh, 10 ** 5)
+add_stage("batch.partial_transpose", _pair_batch, partial_transpose_b, 10 ** 5)
+add_stage("batch.ppt_det_test", _pair_batch, ppt_det_test, 10 ** 5)
+add_stage("batch.entropy", lambda n, rng: np.linalg.eigvalsh(_pair_batch(n, rng)), entropy, 10 ** 5)
+add_stage("batch.analyze", _amps, analyze_batch)
+
+# старт процесса для одной точки (размер батча не используется)
+add_stage("startup", lambda n, rng: None, lambda _: measure_startup(), 1)
+
+# запись результатов в БД
+add_stage("db.save_experiment", _records, _db_write("single"), 10 ** 4)
+add_stage("db.save_experiments_bulk", _records, _db_write("bulk"), 10 ** 5)
+
+
+# минимальное время из repeat запусков (повторы прекращаются, если набрано больше секунды)
+def _measure(stage, size, repeat, rng):
+    data = stage.setup(size, rng)
+    best = float('inf')
+    total = 0.0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            stage.run(data)
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total > 1.0:
+            break
+    return best
+
+
+# прогон выбранных этапов по размерам батча; результат - секунды на весь батч
+def run_benchmarks(stages=None, sizes=DEFAULT_SIZES, repeat=5, time_budget=DEFAULT_TIME_BUDGET, seed=0,
+                   verbose=True):
+    names = stages or list(STAGES)
+    rng = np.random.default_rng(seed)
+    results = {}
+    for name in names:
+        stage = STAGES[name]
+        if not stage.available():
+            if verbose:
+                print(f"{name}: пропущен (нет модуля {stage.requires})")
+            continue
+        results[name] = {}
+        for size in sizes:
+            if stage.max_size is not None and size > stage.max_size:
+                break
+            seconds = _measure(stage, size, repeat, rng)
+            results[name][str(size)] = seconds
+            if verbose:
+                print(f"{name:28s} {size:>8d}  {seconds:12.6f} с  {seconds / size * 1e6:10.3f} мкс/точку")
+            if seconds > time_budget:
+                break
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine()
+        },
+        "results": results
+    }
+
+
+def save_baseline(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# регрессии относительно baseline: (этап, размер, было, стало, отношение) для замедления больше threshold
+# и больше min_delta секунд. этапы и размеры, которых нет в одном из отчётов, не сравниваются
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    regressions = []
+    for name, timings in report["results"].items():
+        reference = baseline["results"].get(name, {})
+        for size, seconds in timings.items():
+            if size not in reference or reference[size] <= 0:
+                continue
+            ratio = seconds / reference[size]
+            if ratio > 1 + threshold and seconds - reference[size] > min_delta:
+                regressions.append((name, int(size), reference[size], seconds, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="замеры времени этапов анализа по размерам батча")
+    parser.add_argument("--stages", nargs="*", help="этапы (по умолчанию все): " + ", ".join(STAGES))
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--max-size", type=int, help="ограничить размеры батча сверху")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET)
+    parser.add_argument("--save", help="сохранить результат как JSON baseline")
+    parser.add_argument("--baseline", help="сравнить с сохранённым baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--check-startup", action="store_true",
+                        help="только проверить время старта и отсутствие тяжёлых импортов")
+    parser.add_argument("--startup-limit", type=float, default=DEFAULT_STARTUP_LIMIT)
+    args = parser.parse_args()
+
+    if args.check_startup:
+        seconds, problems = check_startup(args.startup_limit)
+        print(f"Старт и анализ одной точки: {seconds:.3f} с")
+        for problem in problems:
+            print(f"  ОШИБКА: {problem}")
+        sys.exit(1 if problems else 0)
+
+    unknown = [name for name in args.stages or [] if name not in STAGES]
+    if unknown:
+        parser.error(f"неизвестные этапы: {', '.join(unknown)}")
+    sizes = [n for n in args.sizes if args.max_size is None or n <= args.max_size]
+
+    report = run_benchmarks(args.stages, sizes, args.repeat, args.time_budget)
+    if args.save:
+        save_baseline(report, args.save)
+        print(f"\nBaseline сохранён: {args.save}")
+
+    if args.baseline:
+        regressions = compare(report, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print(f"\nРегрессии (медленнее baseline больше чем на {args.threshold:.0%}):")
+            for name, size, before, after, ratio in regressions:
+                print(f"  {name} [{size}]: {before:.6f} с -> {after:.6f} с (x{ratio:.2f})")
+            sys.exit(1)
+        print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import itertools
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+from families import get_family
+from sweep import FAMILIES, INVALID, PARAMETERS, SUBSYSTEMS, analyze_batch, point_results
+from symmetry import stabilizers
+
+
+# колонки результата, которые хранятся в кэше для канонической точки
+_CACHED = ("single_entropies", "pair_entropies", "pt_negative", "entangled",
+           "entangled_count", "fully_separable", "classification")
+_PER_QUBIT = ("single_entropies",)
+_PER_PAIR = ("pair_entropies", "pt_negative", "entangled")
+
+_SYMMETRIES = {}
+
+
+def _signed_permutations(k):
+    for perm in itertools.permutations(range(k)):
+        for signs in itertools.product([1.0, -1.0], repeat=k):
+            g = np.zeros((k, k))
+            g[range(k), perm] = signs
+            yield g
+
+
+# отображения индексов амплитуд для перестановки кубитов perm и флипов X по маске x:
+# new[i] = old[index_map[i]], новый кубит q соответствует старому perm[q]
+def _index_maps():
+    maps = []
+    perms = []
+    for perm in itertools.permutations(range(4)):
+        base = np.arange(16).reshape(2, 2, 2, 2).transpose(perm).ravel()
+        for x in range(16):
+            maps.append(base[np.arange(16) ^ x])
+            perms.append(perm)
+    return np.array(maps), np.array(perms)
+
+
+# знаковые паттерны локальных Z (и глобального знака): (-1)^{popcount(i & z)}
+def _z_patterns():
+    patterns = np.array([[(-1) ** bin(i & z).count('1') for i in range(16)] for z in range(16)])
+    return np.concatenate([patterns, -patterns])
+
+
+# симметрии семейства: знаковые перестановки параметров g, для которых
+# state(g p) = (локальные X/Z) * (перестановка кубитов perm) * state(p) при любом p.
+# ищутся перебором на случайных точках общего положения один раз на семейство
+def family_symmetries(family):
+    if family in _SYMMETRIES:
+        return _SYMMETRIES[family]
+    build = FAMILIES[family]
+    k = len(PARAMETERS[family])
+    maps, perms = _index_maps()
+    z_patterns = _z_patterns()
+    probes = np.random.default_rng(12345).normal(size=(3, k))
+    old = build(probes)
+
+    gmats = []
+    qubit_perms = []
+    for g in _signed_permutations(k):
+        new = build(probes @ g.T)
+        ok = np.ones(len(maps), dtype=bool)
+        for n in range(len(probes)):
+            candidates = z_patterns[None] * old[n][maps][:, None, :]
+            ok &= np.any(np.all(np.abs(candidates - new[n]) < 1e-9, axis=-1), axis=-1)
+        if ok.any():
+            gmats.append(g)
+            qubit_perms.append(perms[np.argmax(ok)])
+    _SYMMETRIES[family] = (np.array(gmats), np.array(qubit_perms))
+    return _SYMMETRIES[family]
+
+
+# индексы пар после перестановки кубитов: пара (i, j) -> пара (perm[i], perm[j])
+def _pair_map(perm):
+    index = {frozenset(idx): k for k, idx in enumerate(SUBSYSTEMS.values())}
+    return np.array([index[frozenset((perm[i], perm[j]))] for i, j in SUBSYSTEMS.values()])
+
+
+# лексикографическое a > b построчно
+def _lex_greater(a, b):
+    differ = a != b
+    first = np.argmax(differ, axis=1)
+    rows = np.arange(len(a))
+    return differ.any(axis=1) & (a[rows, first] > b[rows, first])
+
+
+# каноническая форма батча параметров (N, k): нормировка (для однородных семейств) и
+# лексикографический максимум по орбите симметрий. Возвращает (канонические параметры,
+# округлённые ключи, обратные перестановки кубитов (N, 4): S_j(p) = S_{inv[j]}(канон))
+def canonicalize(family, params, decimals=10):
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    # однородные семейства: psi.unit() убирает множитель k
+    if get_family(family).homogeneous:
+        norms = np.linalg.norm(params, axis=1, keepdims=True)
+        params = np.divide(params, norms, out=np.zeros_like(params), where=norms > 0)
+    gmats, qubit_perms = family_symmetries(family)
+
+    best = params
+    best_key = np.round(params, decimals) + 0.0
+    best_perm = np.tile(np.arange(4), (len(params), 1))
+    for g, perm in zip(gmats, qubit_perms):
+        candidate = params @ g.T
+        key = np.round(candidate, decimals) + 0.0
+        better = _lex_greater(key, best_key)
+        best = np.where(better[:, None], candidate, best)
+        best_key = np.where(better[:, None], key, best_key)
+        best_perm = np.where(better[:, None], perm, best_perm)
+    inverse = np.argsort(best_perm, axis=1)
+    return best, best_key, inverse
+
+
+# кэш результатов анализа с ключом по канонической форме параметров,
+# LRU вытеснением и необязательным сохранением на диск (pickle)
+class AnalysisCache:
+    def __init__(self, maxsize=1000000, path=None, decimals=10, tol=1e-9):
+        self.maxsize = maxsize
+        self.path = path
+        self.decimals = decimals
+        self.tol = tol
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _put(self, key, row):
+        self.entries[key] = row
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    # свип с кэшем: тот же словарь массивов, что и sweep.sweep
+    def sweep(self, family, params):
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        canonical, keys, inverse = canonicalize(family, params, self.decimals)
+        keys = [(family, key.tobytes()) for key in keys]
+
+        unique = list(dict.fromkeys(keys))
+        missing = [key for key in unique if key not in self.entries]
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        if missing:
+            first = {key: i for i, key in reversed(list(enumerate(keys)))}
+            rows = [first[key] for key in missing]
+            computed = analyze_batch(FAMILIES[family](canonical[rows]), self.tol)
+            for n, key in enumerate(missing):
+                self._put(key, tuple(computed[name][n] for name in _CACHED))
+
+        table = {name: [] for name in _CACHED}
+        slot = {}
+        for key in unique:
+            slot[key] = len(slot)
+            row = self.entries[key]
+            self.entries.move_to_end(key)
+            for name, value in zip(_CACHED, row):
+                table[name].append(value)
+        table = {name: np.array(values) for name, values in table.items()}
+        index = np.array([slot[key] for key in keys])
+
+        results = {}
+        rows = index[:, None]
+        perms, which = np.unique(inverse, axis=0, return_inverse=True)
+        pair_maps = np.array([_pair_map(perm) for perm in perms])[which.ravel()]
+        for name in _CACHED:
+            if name in _PER_QUBIT:
+                results[name] = table[name][rows, inverse]
+            elif name in _PER_PAIR:
+                results[name] = table[name][rows, pair_maps]
+            else:
+                results[name] = table[name][index]
+        results["amplitudes"] = FAMILIES[family](params)
+        # стабилизатор не переносится с канонической точки (локальные X/Z его меняют) - считается по амплитудам
+        results["stabilizer"] = np.where(results["classification"] == INVALID, 0,
+                                         stabilizers(results["amplitudes"])).astype(np.int32)
+        results["parameters"] = params
+        return results
+
+    # результат одной точки в формате main()
+    def analyze(self, family, params):
+        return point_results(self.sweep(family, [params]), 0)
+
+    def save(self, path=None):
+        path = path or self.path
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"decimals": self.decimals, "tol": self.tol, "entries": self.entries}, f)
+        os.replace(tmp, path)
+
+    # загрузка с диска; файл с другими decimals/tol игнорируется
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data["decimals"] == self.decimals and data["tol"] == self.tol:
+            for key, row in data["entries"].items():
+                self._put(key, row)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
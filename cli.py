@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from measures import MEASURE_COLUMNS
+from sweep import FAMILIES, PAIR_NAMES, PARAMETERS, analyze_batch, classification_label, point_results
+from symmetry import symmetry_labels
+
+# python cli.py G_abcd params.jsonl > results.jsonl
+# параметры - по строке на точку: JSONL ({"a": 1, "b": 0, ...} или [1, 0, ...]) или CSV (с заголовком
+# из имён параметров или без него). Результат - одна компактная JSON-строка на точку в том же порядке
+
+
+def _value(value):
+    # комплексные коэффициенты задаются строкой: "1+2j"
+    return complex(value.replace(" ", "")) if isinstance(value, str) else float(value)
+
+
+# разбор одной строки JSONL в список параметров; None - пустая строка
+def _parse_jsonl(line, names):
+    line = line.strip()
+    if not line:
+        return None
+    record = json.loads(line)
+    if isinstance(record, dict):
+        missing = [name for name in names if name not in record]
+        if missing:
+            raise ValueError(f"нет параметров: {', '.join(missing)}")
+        return [_value(record[name]) for name in names]
+    if len(record) != len(names):
+        raise ValueError(f"ожидалось {len(names)} параметров, получено {len(record)}")
+    return [_value(v) for v in record]
+
+
+def _csv_rows(lines, names):
+    reader = csv.reader(lines)
+    columns = None
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            yield None
+            continue
+        if columns is None:
+            columns = list(range(len(names)))
+            cells = [cell.strip() for cell in row]
+            if all(name in cells for name in names):
+                # строка заголовка: столбцы берутся по именам
+                columns = [cells.index(name) for name in names]
+                yield None
+                continue
+        # ошибка строки возвращается как значение: исключение внутри генератора завершило бы его
+        if max(columns, default=-1) >= len(row):
+            yield ValueError(f"ожидалось {len(names)} параметров, получено {len(row)}")
+            continue
+        try:
+            yield [_value(row[i]) for i in columns]
+        except (ValueError, TypeError) as e:
+            yield e
+
+
+# поток (номер строки, параметры или исключение разбора); пустые строки пропускаются.
+# ошибка csv (испорченная структура файла) - последняя запись потока: читать дальше нельзя
+def read_parameters(lines, names, fmt='jsonl'):
+    if fmt == 'csv':
+        rows = _csv_rows(lines, names)
+        number = 0
+        while True:
+            number += 1
+            try:
+                params = next(rows)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield number, e
+                return
+            if params is not None:
+                yield number, params
+    else:
+        for number, line in enumerate(lines, 1):
+            try:
+                params = _parse_jsonl(line, names)
+            except (ValueError, TypeError) as e:
+                yield number, e
+                continue
+            if params is not None:
+                yield number, params
+
+
+def _number(value):
+    if isinstance(value, complex):
+        return value.real if value.imag == 0 else str(value)
+    return value
+
+
+# NaN и бесконечности -> null: json.dumps пишет их голыми токенами NaN/Infinity, которых нет в JSON
+def _json_safe(value):
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, list):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, dict):
+        return {key: _json_safe(v) for key, v in value.items()}
+    return value
+
+
+# компактные записи результатов батча (столбцы переводятся в списки Python один раз на батч);
+# невалидные точки (нулевая норма) - с null вместо NaN
+def compact_results(names, params, batch):
+    counts = batch["entangled_count"].tolist()
+    codes = batch["classification"].tolist()
+    singles = np.round(batch["single_entropies"], 12).tolist()
+    pairs = np.round(batch["pair_entropies"], 12).tolist()
+    entangled = batch["entangled"].tolist()
+    stabilizers = batch["stabilizer"].tolist()
+    values = params.tolist()
+    measures = {key: np.round(batch[key], 12).tolist() for key in MEASURE_COLUMNS if key != "invariants" and key in batch}
+    if "invariants" in batch:
+        invariants = np.round(np.stack([batch["invariants"].real, batch["invariants"].imag], axis=-1), 12).tolist()
+    columns = [params] + [batch[key].reshape(len(values), -1) for key in ("single_entropies", "pair_entropies")]
+    columns += [batch[key].reshape(len(values), -1) for key in MEASURE_COLUMNS if key in batch]
+    finite = np.all(np.isfinite(np.concatenate(columns, axis=1)), axis=1).tolist()
+    records = []
+    for i in range(len(values)):
+        record = {name: _number(v) for name, v in zip(names, values[i])}
+        record["classification"] = classification_label(codes[i], counts[i])
+        record["entangled_count"] = counts[i]
+        record["single_entropies"] = singles[i]
+        record["pair_entropies"] = pairs[i]
+        record["entangled"] = [name for name, flag in zip(PAIR_NAMES, entangled[i]) if flag]
+        record["symmetry"] = symmetry_labels(stabilizers[i])
+        for key, column in measures.items():
+            record[key] = column[i]
+        if "invariants" in batch:
+            # комплексные L, M, N - парами [re, im]
+            record["invariants"] = invariants[i]
+        records.append(record if finite[i] else _json_safe(record))
+    return records
+
+
+# потоковая обработка: параметры читаются микробатчами по batch_size, результаты пишутся
+# в out сразу после анализа батча, поэтому память не зависит от длины входа.
+# writer - writer.BackgroundWriter для записи в БД или None. Возвращает (обработано, ошибок)
+def process_stream(family, lines, out, fmt='jsonl', batch_size=1024, tol=1e-9, writer=None, errors=None,
+                   measures=False):
+    names = PARAMETERS[family]
+    build = FAMILIES[family]
+    stream = read_parameters(lines, names, fmt)
+    processed = failed = 0
+    while True:
+        batch = list(itertools.islice(stream, batch_size))
+        if not batch:
+            break
+        points = []
+        for number, params in batch:
+            if isinstance(params, Exception):
+                failed += 1
+                if errors is not None:
+                    errors.write(json.dumps({"line": number, "error": str(params)}, ensure_ascii=False) + "\n")
+            else:
+                points.append(params)
+        if not points:
+            continue
+
+        params = np.array(points).reshape(len(points), len(names))
+        if not np.iscomplexobj(params):
+            params = params.astype(float)
+        results = analyze_batch(build(params), tol, measures=measures)
+        lines_out = []
+        for i, record in enumerate(compact_results(names, params, results)):
+            lines_out.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            if writer is not None:
+                parameters = {name: record[name] for name in names}
+                parameters["state_family"] = family
+                experiment = writer.start(f"Анализ 4-кубитного состояния {family}", "потоковый анализ cli.py",
+                                          parameters)
+                # в БД - та же форма results, что у остальных писателей (pairwise_entanglement для триггера 002)
+                writer.finish(experiment, "completed", point_results(results, i))
+        out.write("\n".join(lines_out) + "\n")
+        out.flush()
+        processed += len(points)
+    return processed, failed
+
+
+def _format(path, fmt):
+    if fmt != 'auto':
+        return fmt
+    return 'csv' if path is not None and path.lower().endswith('.csv') else 'jsonl'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="потоковый анализ запутанности: параметры JSONL/CSV -> результаты JSONL")
+    parser.add_argument("family", choices=sorted(FAMILIES), help="семейство состояний")
+    parser.add_argument("input", nargs="?", default="-", help="файл параметров (по умолчанию stdin)")
+    parser.add_argument("-o", "--output", default="-", help="файл результатов (по умолчанию stdout)")
+    parser.add_argument("-f", "--format", choices=("auto", "jsonl", "csv"), default="auto",
+                        help="формат входа (auto - по расширению файла, для stdin - jsonl)")
+    parser.add_argument("-b", "--batch-size", type=int, default=1024)
+    parser.add_argument("--tol", type=float, default=1e-9)
+    parser.add_argument("-m", "--measures", action="store_true",
+                        help="добавить негативность, конкуренцию, tangle и инварианты L, M, N")
+    parser.add_argument("--db", nargs="?", const="", metavar="URL",
+                        help="писать результаты в БД (URL как QUANTUM_DB_URL; без значения - из окружения)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="без сводки и сообщений БД (ошибки разбора по-прежнему в stderr)")
+    args = parser.parse_args(argv)
+
+    path = None if args.input == "-" else args.input
+    fmt = _format(path, args.format)
+    log = open(os.devnull, "w") if args.quiet else sys.stderr
+
+    with contextlib.ExitStack() as stack:
+        lines = stack.enter_context(open(path, newline='')) if path else sys.stdin
+        out = stack.enter_context(open(args.output, "w")) if args.output != "-" else sys.stdout
+        if args.quiet:
+            stack.callback(log.close)
+        # stdout - канал данных: сообщения БД уходят в stderr (или никуда в тихом режиме)
+        stack.enter_context(contextlib.redirect_stdout(log))
+
+        writer = None
+        if args.db is not None:
+            from database import open_database
+            from writer import BackgroundWriter
+            db = open_database(args.db or None)
+            stack.callback(db.close)
+            writer = stack.enter_context(BackgroundWriter(db))
+
+        start = time.perf_counter()
+        processed, failed = process_stream(args.family, lines, out, fmt, args.batch_size, args.tol, writer,
+                                           sys.stderr, args.measures)
+        elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        rate = processed / elapsed if elapsed > 0 else float('inf')
+        print(f"{args.family}: обработано точек {processed}, ошибок {failed}, {elapsed:.3f} с ({rate:.0f} точек/с)",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,82 +1,400 @@
-import psycopg2
+import itertools
 import json
+import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+import numpy as np
+
+import metrics
+
+# каталог SQL-миграций схемы (применяются по порядку имён файлов)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# параметры подключения по умолчанию
+DEFAULT_CONNECTION_PARAMS = {
+    'host': 'localhost',
+    'database': 'quantum_experiments',
+    'user': 'quantum_user',
+    'password': 'quantum_password'
+}
+
+# переменные окружения, переопределяющие параметры подключения
+ENV_CONNECTION_PARAMS = {
+    'host': 'QUANTUM_DB_HOST',
+    'port': 'QUANTUM_DB_PORT',
+    'database': 'QUANTUM_DB_NAME',
+    'user': 'QUANTUM_DB_USER',
+    'password': 'QUANTUM_DB_PASSWORD'
+}
+
+# подготовленные запросы (PREPARE на сервере один раз на соединение)
+STATEMENTS = {
+    'save_experiment': """
+        INSERT INTO experiments (name, description, parameters, status, created_at, results)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        RETURNING id
+    """,
+    'update_status_results': "UPDATE experiments SET status = $1, results = $2 WHERE id = $3",
+    'update_status': "UPDATE experiments SET status = $1 WHERE id = $2"
+}
+
+# числовой параметр из JSONB: NULL для нечисловых значений (комплексные коэффициенты - строки).
+# то же выражение, что в индексах experiments_param_*_idx, поэтому диапазонные условия их используют
+NUMERIC_PARAMETER = "(CASE WHEN jsonb_typeof(parameters -> %s) = 'number' THEN (parameters ->> %s)::double precision END)"
+
+BULK_INSERT_QUERY = """
+    INSERT INTO experiments (name, description, parameters, status, created_at, results)
+    VALUES %s
+    RETURNING id
+"""
+
+# results = NULL в строке обновления оставляет прежние результаты
+BULK_UPDATE_QUERY = """
+    UPDATE experiments AS e
+    SET status = v.status,
+        results = COALESCE(v.results::jsonb, e.results::jsonb)
+    FROM (VALUES %s) AS v (id, status, results)
+    WHERE e.id = v.id
+"""
+
+
+# параметры подключения: аргументы > переменные окружения > JSON-конфиг > значения по умолчанию.
+# путь к конфигу - config_path или переменная QUANTUM_DB_CONFIG.
+# с dsn берутся только явные аргументы: psycopg2 ставит ключевые аргументы выше DSN,
+# и подмешанные значения по умолчанию подменили бы хост и базу из URL
+def load_connection_params(config_path=None, **overrides):
+    if overrides.get('dsn') is not None:
+        return {key: value for key, value in overrides.items() if value is not None}
+    params = dict(DEFAULT_CONNECTION_PARAMS)
+    config_path = config_path or os.environ.get('QUANTUM_DB_CONFIG')
+    if config_path:
+        with open(config_path) as f:
+            params.update(json.load(f))
+    for key, env_name in ENV_CONNECTION_PARAMS.items():
+        if env_name in os.environ:
+            params[key] = os.environ[env_name]
+    params.update({key: value for key, value in overrides.items() if value is not None})
+    return params
+
+
 class ExperimentDB:
-    def __init__(self):
-        self.connection_params = {
-            'host': 'localhost',
-            'database': 'quantum_experiments',
-            'user': 'quantum_user',
-            'password': 'quantum_password'
-        }
-    
+    def __init__(self, minconn=1, maxconn=4, config_path=None, **connection_params):
+        self.connection_params = load_connection_params(config_path, **connection_params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # соединение -> имена уже подготовленных на нём запросов
+        self._prepared = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # пул создаётся при первом обращении, чтобы недоступный сервер не ломал конструктор;
+    # psycopg2 импортируется тут же, поэтому запуски с SQLite его не загружают
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                from psycopg2 import pool
+                with metrics.stage("db.connect"):
+                    self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.connection_params)
+            return self._pool
+
+    # соединение из пула на время одной транзакции: commit при успехе, rollback при ошибке;
+    # разорванное соединение в пул не возвращается
+    @contextmanager
+    def connection(self):
+        connection_pool = self._get_pool()
+        with metrics.stage("db.getconn"):
+            conn = connection_pool.getconn()
+        broken = False
+        try:
+            yield conn
+            with metrics.stage("db.commit"):
+                conn.commit()
+        except Exception:
+            broken = conn.closed != 0
+            if not broken:
+                conn.rollback()
+            raise
+        finally:
+            if broken:
+                self._prepared.pop(conn, None)
+            connection_pool.putconn(conn, close=broken)
+
+    # EXECUTE подготовленного запроса, PREPARE - только при первом использовании на соединении
+    def _execute(self, conn, cursor, name, args):
+        prepared = self._prepared.setdefault(conn, set())
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+            prepared.add(name)
+        placeholders = ", ".join(["%s"] * len(args))
+        with metrics.stage(f"db.execute.{name}"):
+            cursor.execute(f"EXECUTE {name} ({placeholders})", args)
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._prepared.clear()
+
     # сохранение информации о запуске эксперимента
     def save_experiment(self, name, description, parameters):
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cursor = conn.cursor()
-            
-            # SQL request для вставки
-            query = """
-            INSERT INTO experiments (name, description, parameters, status, created_at, results)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id;
-            """
-            
-            #выполнение запроса
-            cursor.execute(query, (
-                name,
-                description,
-                json.dumps(parameters),
-                'running',
-                datetime.now(),
-                json.dumps({}),
-            ))
-            
-            # ID новой записи
-            experiment_id = cursor.fetchone()[0]
-            
-            # сохранение изменений
-            conn.commit()
-            
+            with self.connection() as conn, conn.cursor() as cursor:
+                self._execute(conn, cursor, 'save_experiment', (
+                    name,
+                    description,
+                    json.dumps(parameters),
+                    'running',
+                    datetime.now(),
+                    json.dumps({}),
+                ))
+                # ID новой записи
+                experiment_id = cursor.fetchone()[0]
+
             print(f"Эксперимент сохранён в БД. ID: {experiment_id}")
-            
-            # закрытие соединения
-            cursor.close()
-            conn.close()
-            
             return experiment_id
-            
+
         except Exception as e:
             print(f"Ошибка сохранения эксперимента: {e}")
             return None
-    
+
     # обновить статус эксперимента
     def update_status(self, experiment_id, status, results=None):
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            cursor = conn.cursor()
-            
-            if results:
-                # обнова двух полей: status и results
-                query = """
-                UPDATE experiments 
-                SET status = %s, 
-                    results = %s 
-                WHERE id = %s
-                """
-                cursor.execute(query, (status, json.dumps(results), experiment_id))
-            else:
-                # только статус
-                query = "UPDATE experiments SET status = %s WHERE id = %s"
-                cursor.execute(query, (status, experiment_id))
-            
-            conn.commit()
+            with self.connection() as conn, conn.cursor() as cursor:
+                if results:
+                    # обнова двух полей: status и results
+                    self._execute(conn, cursor, 'update_status_results',
+                                  (status, json.dumps(results), experiment_id))
+                else:
+                    # только статус
+                    self._execute(conn, cursor, 'update_status', (status, experiment_id))
+
             print(f"Статус эксперимента {experiment_id} обновлён на '{status}'")
-            
-            cursor.close()
-            conn.close()
-            
+
+        except Exception as e:
+            print(f"Ошибка обновления статуса: {e}")
+
+    # пакетная запись: records - итерируемое (parameters, results, status[, created_at]).
+    # каждые batch_size записей уходят одним INSERT ... VALUES в одной транзакции,
+    # возвращается список id в порядке records (при ошибке - id уже сохранённых пакетов)
+    def save_experiments_bulk(self, records, name, description, batch_size=1000):
+        from psycopg2.extras import execute_values
+        records = iter(records)
+        ids = []
+        try:
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                created_at = datetime.now()
+                rows = [
+                    (name, description, json.dumps(parameters), status,
+                     rest[0] if rest else created_at, json.dumps(results or {}))
+                    for parameters, results, status, *rest in batch
+                ]
+                with self.connection() as conn, conn.cursor() as cursor, metrics.stage("db.execute.bulk_insert"):
+                    returned = execute_values(cursor, BULK_INSERT_QUERY, rows, page_size=len(rows), fetch=True)
+                ids.extend(row[0] for row in returned)
+                metrics.count("db.rows_inserted", len(rows))
+
+            print(f"Сохранено экспериментов в БД: {len(ids)}")
+
         except Exception as e:
-            print(f"Ошибка обновления статуса: {e}")
\ No newline at end of file
+            print(f"Ошибка пакетного сохранения экспериментов: {e}")
+
+        return ids
+
+    # пакетное обновление статусов: updates - итерируемое (experiment_id, status, results или None)
+    def update_status_bulk(self, updates, batch_size=1000):
+        from psycopg2.extras import execute_values
+        updates = iter(updates)
+        updated = 0
+        try:
+            while True:
+                batch = list(itertools.islice(updates, batch_size))
+                if not batch:
+                    break
+                rows = [
+                    (experiment_id, status, json.dumps(results) if results else None)
+                    for experiment_id, status, results in batch
+                ]
+                with self.connection() as conn, conn.cursor() as cursor, metrics.stage("db.execute.bulk_update"):
+                    execute_values(cursor, BULK_UPDATE_QUERY, rows, page_size=len(rows))
+                updated += len(rows)
+                metrics.count("db.rows_updated", len(rows))
+
+            print(f"Обновлено статусов экспериментов: {updated}")
+
+        except Exception as e:
+            print(f"Ошибка пакетного обновления статусов: {e}")
+
+        return updated
+
+    # применение недостающих миграций из migrations/*.sql, каждая в своей транзакции
+    def migrate(self, directory=MIGRATIONS_DIR):
+        with self.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    applied_at TIMESTAMP NOT NULL
+                )
+            """)
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.sql') or filename in applied:
+                continue
+            with open(os.path.join(directory, filename)) as f:
+                sql = f.read()
+            with self.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrations (version, applied_at) VALUES (%s, %s)",
+                               (filename, datetime.now()))
+            # схема поменялась - подготовленные запросы на старых соединениях сбрасываются
+            self.close()
+            print(f"Применена миграция {filename}")
+
+    def _fetch_columns(self, query, args, names):
+        with self.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(query, args)
+            rows = cursor.fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(names)
+        return {name: np.array(column) for name, column in zip(names, columns)}
+
+    # выборка экспериментов с фильтрацией на стороне SQL; результат - словарь NumPy массивов.
+    # classification сравнивается по префиксу ('W-type', 'GHZ-type', 'fully_separable'),
+    # parameter_ranges: {'a': (0.5, None)} - нижняя/верхняя граница (None - без ограничения)
+    def query_experiments(self, state_family=None, classification=None, status='completed',
+                          min_entangled=None, max_entangled=None, parameter_ranges=None,
+                          parameter_names=None, limit=None):
+        if parameter_names is None:
+            parameter_names = _family_parameters(state_family)
+        conditions = []
+        args = []
+        if state_family is not None:
+            conditions.append("state_family = %s")
+            args.append(state_family)
+        if status is not None:
+            conditions.append("status = %s")
+            args.append(status)
+        if classification is not None:
+            conditions.append("classification LIKE %s")
+            args.append(classification.replace('%', r'\%').replace('_', r'\_') + '%')
+        if min_entangled is not None:
+            conditions.append("entangled_count >= %s")
+            args.append(min_entangled)
+        if max_entangled is not None:
+            conditions.append("entangled_count <= %s")
+            args.append(max_entangled)
+        for name, (low, high) in (parameter_ranges or {}).items():
+            if low is not None:
+                conditions.append(f"{NUMERIC_PARAMETER} >= %s")
+                args.extend([name, name, low])
+            if high is not None:
+                conditions.append(f"{NUMERIC_PARAMETER} <= %s")
+                args.extend([name, name, high])
+
+        selected = ["id", "classification", "entangled_count"]
+        selected += [NUMERIC_PARAMETER for _ in parameter_names]
+        query = f"SELECT {', '.join(selected)} FROM experiments"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        columns = self._fetch_columns(query, [name for name in parameter_names for _ in range(2)] + args,
+                                      ["id", "classification", "entangled_count"] + list(parameter_names))
+        result = {name: columns[name] for name in ("id", "classification", "entangled_count")}
+        result["parameters"] = (np.stack([columns[name].astype(float) for name in parameter_names], axis=1)
+                                if parameter_names else np.empty((len(result["id"]), 0)))
+        return result
+
+    # выборка результатов по парам кубитов (таблица pairwise_results)
+    def query_pairs(self, state_family=None, pair=None, min_entropy=None, max_entropy=None, entangled=None):
+        conditions = []
+        args = []
+        if state_family is not None:
+            conditions.append("e.state_family = %s")
+            args.append(state_family)
+        if pair is not None:
+            conditions.append("p.pair = %s")
+            args.append(pair)
+        if min_entropy is not None:
+            conditions.append("p.entropy >= %s")
+            args.append(min_entropy)
+        if max_entropy is not None:
+            conditions.append("p.entropy <= %s")
+            args.append(max_entropy)
+        if entangled is not None:
+            conditions.append("p.entangled = %s")
+            args.append(entangled)
+        query = """
+            SELECT p.experiment_id, p.pair, p.entropy, p.entangled, COALESCE(p.pt_negative, 0)
+            FROM pairwise_results AS p JOIN experiments AS e ON e.id = p.experiment_id
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY p.experiment_id, p.pair"
+        return self._fetch_columns(query, args, ["experiment_id", "pair", "entropy", "entangled", "pt_negative"])
+
+    # число завершённых экспериментов по классификациям
+    def classification_counts(self, state_family=None):
+        query = "SELECT classification, COUNT(*) FROM experiments WHERE status = 'completed'"
+        args = []
+        if state_family is not None:
+            query += " AND state_family = %s"
+            args.append(state_family)
+        query += " GROUP BY classification ORDER BY classification"
+        return self._fetch_columns(query, args, ["classification", "count"])
+
+    # агрегаты по парам: средняя/минимальная/максимальная энтропия и доля запутанных
+    def pair_statistics(self, state_family=None):
+        query = """
+            SELECT p.pair, COUNT(*), AVG(p.entropy), MIN(p.entropy), MAX(p.entropy),
+                   AVG(p.entangled::integer)::double precision
+            FROM pairwise_results AS p JOIN experiments AS e ON e.id = p.experiment_id
+        """
+        args = []
+        if state_family is not None:
+            query += " WHERE e.state_family = %s"
+            args.append(state_family)
+        query += " GROUP BY p.pair ORDER BY p.pair"
+        return self._fetch_columns(query, args, ["pair", "count", "mean_entropy", "min_entropy",
+                                                 "max_entropy", "entangled_fraction"])
+
+
+# хранилище экспериментов по URL (аргумент или переменная QUANTUM_DB_URL):
+# sqlite:///путь/к/файлу.sqlite - встроенный SQLite, postgresql://... - PostgreSQL по DSN,
+# без URL - PostgreSQL с параметрами из load_connection_params()
+def open_database(url=None, **kwargs):
+    url = url or os.environ.get('QUANTUM_DB_URL')
+    if url and url.startswith('sqlite:///'):
+        from sqlite_db import SQLiteExperimentDB
+        return SQLiteExperimentDB(url[len('sqlite:///'):], **kwargs)
+    if url:
+        return ExperimentDB(dsn=url, **kwargs)
+    return ExperimentDB(**kwargs)
+
+
+def _family_parameters(state_family):
+    if state_family is None:
+        return ()
+    from sweep import PARAMETERS
+    return PARAMETERS.get(state_family, ())
+
+
+# python database.py - применить миграции схемы
+if __name__ == "__main__":
+    with ExperimentDB() as db:
+        db.migrate()
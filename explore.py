@@ -0,0 +1,136 @@
+import itertools
+
+import numpy as np
+
+from sweep import INVALID, PARAMETERS, classification_label, sweep
+
+# метка области: код классификации и число запутанных пар в одном целом (code * 8 + count)
+LABEL_BASE = 8
+
+
+def point_labels(results):
+    return results["classification"].astype(np.int64) * LABEL_BASE + results["entangled_count"]
+
+
+# невалидная точка (INVALID, INVALID) даёт отрицательную метку: divmod разобрал бы её в чужой класс
+def region_label(label):
+    if label < 0:
+        return classification_label(INVALID, INVALID)
+    code, count = divmod(int(label), LABEL_BASE)
+    return classification_label(code, count)
+
+
+# адаптивное исследование фазовой диаграммы классификации: грубая сетка ячеек по свободным
+# параметрам bounds = {имя: (min, max)}, ячейка делится пополам по всем осям (quadtree/octree),
+# только если метки в её углах различаются. остальные параметры семейства фиксируются через fixed.
+# все точки лежат на мелкой решётке (coarse - 1) * 2**depth + 1 по каждой оси, поэтому общие углы
+# соседних ячеек и уровней вычисляются один раз; точки одного уровня считаются одним батчем.
+# ячейка с одинаковыми углами считается однородной - области мельче ячейки грубой сетки могут быть
+# пропущены, их разрешение задаёт coarse
+def explore(family, bounds, fixed=None, coarse=9, depth=6, tol=1e-9, chunk_size=16384):
+    fixed = dict(fixed or {})
+    names = PARAMETERS[family]
+    free = [name for name in names if name in bounds]
+    missing = [name for name in names if name not in bounds and name not in fixed]
+    if missing or len(free) != len(bounds):
+        raise ValueError(f"параметры {family}: {', '.join(names)}; не заданы: {', '.join(missing) or '-'}")
+
+    k = len(free)
+    lower = np.array([bounds[name][0] for name in free], dtype=float)
+    upper = np.array([bounds[name][1] for name in free], dtype=float)
+    coarse = np.broadcast_to(np.asarray(coarse, dtype=np.int64), (k,))
+    if np.any(coarse < 2):
+        raise ValueError("coarse должно быть не меньше 2 по каждой оси")
+    scale = 2 ** depth
+    shape = tuple(int(n) for n in (coarse - 1) * scale + 1)
+    step = (upper - lower) / (np.array(shape) - 1)
+    columns = [names.index(name) for name in free]
+    template = np.array([fixed.get(name, 0.0) for name in names], dtype=float)
+
+    # вычисленные точки решётки: отсортированные линейные индексы и их метки
+    keys = np.empty(0, dtype=np.int64)
+    labels = np.empty(0, dtype=np.int64)
+    coords_done = []
+
+    def evaluate(coords):
+        nonlocal keys, labels
+        flat = np.ravel_multi_index(coords.T, shape)
+        new, first = np.unique(flat, return_index=True)
+        known = np.isin(new, keys, assume_unique=True)
+        new, first = new[~known], first[~known]
+        if len(new):
+            params = np.tile(template, (len(new), 1))
+            params[:, columns] = lower + coords[first] * step
+            new_labels = point_labels(sweep(family, params, tol, chunk_size))
+            coords_done.append(coords[first])
+            keys = np.concatenate([keys, new])
+            labels = np.concatenate([labels, new_labels])
+            order = np.argsort(keys)
+            keys, labels = keys[order], labels[order]
+        return labels[np.searchsorted(keys, flat)]
+
+    offsets = np.array(list(itertools.product((0, 1), repeat=k)), dtype=np.int64)
+    cells = np.stack(np.meshgrid(*[np.arange(n - 1) * scale for n in coarse], indexing='ij'), -1).reshape(-1, k)
+    size = scale
+    uniform_cells, uniform_sizes, uniform_labels = [], [], []
+    boundary = np.empty((0, k), dtype=np.int64)
+
+    while len(cells):
+        corners = (cells[:, None, :] + offsets * size).reshape(-1, k)
+        corner_labels = evaluate(corners).reshape(len(cells), len(offsets))
+        uniform = np.all(corner_labels == corner_labels[:, :1], axis=1)
+        uniform_cells.append(cells[uniform])
+        uniform_sizes.append(np.full(uniform.sum(), size))
+        uniform_labels.append(corner_labels[uniform, 0])
+        mixed = cells[~uniform]
+        if size == 1:
+            boundary = mixed
+            break
+        size //= 2
+        cells = (mixed[:, None, :] + offsets * size).reshape(-1, k)
+
+    cell_lower = np.concatenate(uniform_cells)
+    cell_size = np.concatenate(uniform_sizes)
+    cell_labels = np.concatenate(uniform_labels)
+    points = np.concatenate(coords_done) if coords_done else np.empty((0, k), dtype=np.int64)
+    point_values = np.tile(template, (len(points), 1))
+    point_values[:, columns] = lower + points * step
+    evaluated_labels = evaluate(points) if len(points) else np.empty(0, dtype=np.int64)
+
+    # доли объёма однородных областей; граничные ячейки остаются неразмеченными
+    volume = cell_size.astype(float) ** k / np.prod(np.array(shape) - 1)
+    regions = {}
+    for label in np.unique(cell_labels):
+        regions[region_label(label)] = float(volume[cell_labels == label].sum())
+
+    return {
+        "parameters": point_values,
+        "labels": evaluated_labels,
+        "free_parameters": free,
+        "cells_lower": lower + cell_lower * step,
+        "cells_upper": lower + (cell_lower + cell_size[:, None]) * step,
+        "cells_label": cell_labels,
+        "boundary_lower": lower + boundary * step,
+        "boundary_upper": lower + (boundary + 1) * step,
+        "regions": regions,
+        "boundary_fraction": float(len(boundary) / np.prod(np.array(shape) - 1)),
+        "calls": len(points),
+        "dense_calls": int(np.prod(shape))
+    }
+
+
+def main():
+    result = explore("L_abc2", {"a": (-2, 2), "b": (-2, 2)}, fixed={"c": 0.5}, coarse=9, depth=6)
+    print("=" * 70)
+    print("АДАПТИВНОЕ ИССЛЕДОВАНИЕ L_abc2, c = 0.5")
+    print("=" * 70)
+    print(f"Вызовов анализа: {result['calls']} (плотная сетка того же разрешения: {result['dense_calls']})")
+    print(f"Граничных ячеек: {len(result['boundary_lower'])} "
+          f"(доля площади {result['boundary_fraction']:.4f})")
+    print("\nОбласти (доля площади):")
+    for label, fraction in sorted(result["regions"].items(), key=lambda item: -item[1]):
+        print(f"  {label}: {fraction:.4f}")
+
+
+if __name__ == "__main__":
+    main()
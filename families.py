@@ -0,0 +1,120 @@
+import numpy as np
+
+# ключ свободного члена в описании семейства
+CONST = "1"
+
+_SQRT1_2 = 1 / np.sqrt(2)
+
+
+# семейство 4-кубитных состояний, заданное один раз как разреженное линейное (аффинное)
+# отображение параметров в 16 амплитуд: terms = {базисное состояние: {параметр или CONST: коэффициент}}.
+# матрица (16, k) и свободный вектор собираются при импорте, так что батч состояний -
+# одно матричное произведение params @ matrix.T + offset с последующей нормировкой
+class StateFamily:
+    def __init__(self, name, parameters, terms):
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.terms = terms
+        self.matrix = np.zeros((16, len(self.parameters)), dtype=complex)
+        self.offset = np.zeros(16, dtype=complex)
+        for basis_state, coefficients in terms.items():
+            index = int(basis_state, 2)
+            for key, value in coefficients.items():
+                if key == CONST:
+                    self.offset[index] += value
+                else:
+                    self.matrix[index, self.parameters.index(key)] += value
+        # без свободного члена psi.unit() убирает масштаб параметров
+        self.homogeneous = not self.offset.any()
+
+    def __repr__(self):
+        return f"StateFamily({self.name!r}, {self.parameters})"
+
+    # амплитуды батча: params (N, k) или (k,) -> (N, 16), нормированные; нулевой вектор -> NaN
+    def amplitudes(self, params):
+        params = np.asarray(params)
+        if self.parameters:
+            params = params.reshape(-1, len(self.parameters))
+        else:
+            params = np.zeros((len(params) if params.ndim == 2 else 1, 0))
+        amps = params @ self.matrix.T + self.offset
+        norms = np.linalg.norm(amps, axis=1, keepdims=True)
+        return np.divide(amps, norms, out=np.full_like(amps, np.nan), where=norms > 0)
+
+    # одно состояние как кет текущего бэкенда (backend.py: NumpyQobj или qutip.Qobj)
+    def state(self, params):
+        import backend
+        return backend.ket(self.amplitudes(params)[0], [2, 2, 2, 2])
+
+    # одно состояние как кет QuTiP (qutip импортируется только здесь)
+    def qobj(self, params):
+        from qutip import Qobj
+        return Qobj(self.amplitudes(params)[0].reshape(16, 1), dims=[[2, 2, 2, 2], [1, 1, 1, 1]])
+
+
+REGISTRY = {}
+
+
+def register(family):
+    REGISTRY[family.name] = family
+    return family
+
+
+def get_family(name):
+    try:
+        return REGISTRY[name]
+    except KeyError:
+        raise KeyError(f"неизвестное семейство состояний: {name}; доступны: {', '.join(REGISTRY)}") from None
+
+
+# девять SLOCC-семейств 4 кубитов (Verstraete, Dehaene, De Moor, Verschelde, 2002)
+
+register(StateFamily("G_abcd", ("a", "b", "c", "d"), {
+    "0000": {"a": 0.5, "d": 0.5}, "1111": {"a": 0.5, "d": 0.5},
+    "0011": {"a": 0.5, "d": -0.5}, "1100": {"a": 0.5, "d": -0.5},
+    "0101": {"b": 0.5, "c": 0.5}, "1010": {"b": 0.5, "c": 0.5},
+    "0110": {"b": 0.5, "c": -0.5}, "1001": {"b": 0.5, "c": -0.5}
+}))
+
+register(StateFamily("L_abc2", ("a", "b", "c"), {
+    "0000": {"a": 0.5, "b": 0.5}, "1111": {"a": 0.5, "b": 0.5},
+    "0011": {"a": 0.5, "b": -0.5}, "1100": {"a": 0.5, "b": -0.5},
+    "0101": {"c": 1.0}, "1010": {"c": 1.0},
+    "0110": {CONST: 1.0}
+}))
+
+register(StateFamily("L_a2b2", ("a", "b"), {
+    "0000": {"a": 1.0}, "1111": {"a": 1.0},
+    "0101": {"b": 1.0}, "1010": {"b": 1.0},
+    "0110": {CONST: 1.0}, "0011": {CONST: 1.0}
+}))
+
+register(StateFamily("L_ab3", ("a", "b"), {
+    "0000": {"a": 1.0}, "1111": {"a": 1.0},
+    "0101": {"a": 0.5, "b": 0.5}, "1010": {"a": 0.5, "b": 0.5},
+    "0110": {"a": 0.5, "b": -0.5}, "1001": {"a": 0.5, "b": -0.5},
+    "0001": {CONST: 1j * _SQRT1_2}, "0010": {CONST: 1j * _SQRT1_2},
+    "0111": {CONST: 1j * _SQRT1_2}, "1011": {CONST: 1j * _SQRT1_2}
+}))
+
+register(StateFamily("L_a4", ("a",), {
+    "0000": {"a": 1.0}, "0101": {"a": 1.0}, "1010": {"a": 1.0}, "1111": {"a": 1.0},
+    "0001": {CONST: 1j}, "0110": {CONST: 1.0}, "1011": {CONST: -1j}
+}))
+
+register(StateFamily("L_a2_0_3+1", ("a",), {
+    "0000": {"a": 1.0}, "1111": {"a": 1.0},
+    "0011": {CONST: 1.0}, "0101": {CONST: 1.0}, "0110": {CONST: 1.0}
+}))
+
+register(StateFamily("L_0_5+3", (), {
+    "0000": {CONST: 1.0}, "0101": {CONST: 1.0}, "1000": {CONST: 1.0}, "1110": {CONST: 1.0}
+}))
+
+register(StateFamily("L_0_7+1", (), {
+    "0000": {CONST: 1.0}, "1011": {CONST: 1.0}, "1101": {CONST: 1.0}, "1110": {CONST: 1.0}
+}))
+
+register(StateFamily("L_0_3+1_0_3+1", (), {
+    "0000": {CONST: 1.0}, "0111": {CONST: 1.0}
+}))
@@ -0,0 +1,377 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+from database import BULK_INSERT_QUERY, ExperimentDB, open_database
+from parallel import ParameterGrid
+from sweep import FAMILIES, PARAMETERS, analyze_batch, classification_label, point_results
+
+# распределённый свип через очередь заданий в PostgreSQL (таблица jobs, миграция 003): координатор
+# ставит чанки параметров в очередь, воркеры на любых узлах забирают их FOR UPDATE SKIP LOCKED,
+# шлют heartbeat, результаты чанка пишутся в experiments в одной транзакции с отметкой задания.
+# время захвата и heartbeat - серверное now(), так что расхождение часов узлов не важно:
+#     python jobqueue.py enqueue grid_g G_abcd --axis a=-1,1,101 --axis b=-1,1,101 --axis c=0.5 --axis d=0
+#     python jobqueue.py worker --sweep grid_g        (на каждом узле, сколько угодно процессов)
+#     python jobqueue.py status grid_g --watch
+
+DEFAULT_CHUNK_SIZE = 4096
+HEARTBEAT_INTERVAL = 30.0
+# задание без heartbeat дольше этого считается брошенным и возвращается в очередь
+STALE_TIMEOUT = 120.0
+MAX_ATTEMPTS = 3
+
+ENQUEUE_QUERY = "INSERT INTO jobs (sweep, state_family, parameters, points) VALUES %s"
+
+CLAIM_QUERY = """
+    UPDATE jobs
+    SET status = 'running', worker = %s, attempts = attempts + 1,
+        claimed_at = now(), heartbeat_at = now(), error = NULL
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'pending' AND (%s::text IS NULL OR sweep = %s)
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, sweep, state_family, parameters, attempts
+"""
+
+HEARTBEAT_QUERY = """
+    UPDATE jobs SET heartbeat_at = now()
+    WHERE id = ANY(%s) AND worker = %s AND status = 'running'
+"""
+
+# отметки задания проверяют worker: если захват уже снят по таймауту, строка не меняется
+COMPLETE_QUERY = """
+    UPDATE jobs SET status = 'completed', finished_at = now(), results = %s
+    WHERE id = %s AND worker = %s AND status = 'running'
+"""
+
+# ошибка обработки: повтор, пока не исчерпаны попытки
+FAIL_QUERY = """
+    UPDATE jobs
+    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+        finished_at = CASE WHEN attempts >= %s THEN now() END,
+        worker = NULL, error = %s
+    WHERE id = %s AND worker = %s AND status = 'running'
+"""
+
+REQUEUE_QUERY = """
+    UPDATE jobs
+    SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+        finished_at = CASE WHEN attempts >= %s THEN now() END,
+        worker = NULL, error = 'heartbeat timeout'
+    WHERE status = 'running' AND heartbeat_at < now() - %s * interval '1 second'
+    RETURNING id
+"""
+
+PROGRESS_QUERY = """
+    SELECT status, COUNT(*), COALESCE(SUM(points), 0),
+           EXTRACT(EPOCH FROM MIN(created_at)), EXTRACT(EPOCH FROM now())
+    FROM jobs WHERE sweep = %s GROUP BY status
+"""
+
+SUMMARY_QUERY = """
+    SELECT r.key, SUM(r.value::bigint)
+    FROM jobs AS j, jsonb_each_text(j.results) AS r
+    WHERE j.sweep = %s AND j.status = 'completed'
+    GROUP BY r.key ORDER BY r.key
+"""
+
+
+# захват ушёл к другому воркеру (истёк таймаут heartbeat) - результаты чанка не сохраняются
+class LostClaim(Exception):
+    pass
+
+
+# очередь работает только с PostgreSQL: SKIP LOCKED и общий сервер для всех узлов
+def _require_postgres(db):
+    if not isinstance(db, ExperimentDB):
+        raise ValueError("очередь заданий требует PostgreSQL (ExperimentDB), SQLite не поддерживается")
+
+
+# точки задания из его описания в jobs.parameters
+def job_points(description):
+    if "grid" in description:
+        return ParameterGrid(*description["grid"]).points(description["start"], description["stop"])
+    return np.asarray(description["points"], dtype=float).reshape(len(description["points"]), -1)
+
+
+# поставить свип в очередь чанками по chunk_size точек: params - ParameterGrid (в задание пишется
+# только срез сетки) или массив (N, k). Возвращает число заданий
+def enqueue(db, sweep, family, params, chunk_size=DEFAULT_CHUNK_SIZE):
+    from psycopg2.extras import execute_values
+    _require_postgres(db)
+    if family not in FAMILIES:
+        raise ValueError(f"неизвестное семейство: {family}")
+    k = len(PARAMETERS[family])
+    grid = params if isinstance(params, ParameterGrid) else None
+    if grid is not None:
+        if len(grid.axes) != k:
+            raise ValueError(f"у {family} {k} параметров, у сетки {len(grid.axes)} осей")
+        axes = [ax.tolist() for ax in grid.axes]
+    else:
+        params = np.asarray(params, dtype=float).reshape(-1, k)
+
+    rows = []
+    for start in range(0, len(params), chunk_size):
+        stop = min(start + chunk_size, len(params))
+        if grid is not None:
+            description = {"grid": axes, "start": start, "stop": stop}
+        else:
+            description = {"points": params[start:stop].tolist()}
+        rows.append((sweep, family, json.dumps(description), stop - start))
+
+    with db.connection() as conn, conn.cursor() as cursor, metrics.stage("db.execute.enqueue"):
+        execute_values(cursor, ENQUEUE_QUERY, rows, page_size=1000)
+    print(f"Свип {sweep}: поставлено заданий {len(rows)} ({len(params)} точек {family})")
+    return len(rows)
+
+
+# вернуть в очередь задания без heartbeat дольше timeout секунд; возвращает их id
+def requeue_stale(db, timeout=STALE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(REQUEUE_QUERY, (max_attempts, max_attempts, timeout))
+        ids = [row[0] for row in cursor.fetchall()]
+    if ids:
+        print(f"Возвращено в очередь брошенных заданий: {len(ids)}")
+    return ids
+
+
+# состояние свипа: задания и точки по статусам, доля готовых точек, скорость и оценка остатка
+def progress(db, sweep):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(PROGRESS_QUERY, (sweep,))
+        rows = cursor.fetchall()
+    jobs = {status: 0 for status in ("pending", "running", "completed", "failed")}
+    points = dict(jobs)
+    started = now = None
+    for status, count, total, created, server_now in rows:
+        jobs[status] = count
+        points[status] = int(total)
+        started = float(created) if started is None else min(started, float(created))
+        now = float(server_now)
+    total = sum(points.values())
+    elapsed = now - started if started is not None else 0.0
+    rate = points["completed"] / elapsed if elapsed > 0 else 0.0
+    remaining = points["pending"] + points["running"]
+    return {
+        "sweep": sweep,
+        "jobs": jobs,
+        "points": points,
+        "total_points": total,
+        "done_fraction": points["completed"] / total if total else 0.0,
+        "elapsed": elapsed,
+        "rate": rate,
+        "eta": remaining / rate if rate > 0 else None,
+        "finished": total > 0 and remaining == 0
+    }
+
+
+# число точек по классификациям по всем завершённым заданиям свипа
+def sweep_summary(db, sweep):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(SUMMARY_QUERY, (sweep,))
+        return {label: int(count) for label, count in cursor.fetchall()}
+
+
+def _progress_line(state):
+    points = state["points"]
+    eta = f", осталось ~{state['eta']:.0f} с" if state["eta"] is not None else ""
+    return (f"{state['sweep']}: {state['done_fraction'] * 100:.1f}% ({points['completed']}/{state['total_points']} точек), "
+            f"заданий: ожидают {state['jobs']['pending']}, в работе {state['jobs']['running']}, "
+            f"готово {state['jobs']['completed']}, ошибок {state['jobs']['failed']}; "
+            f"{state['rate']:.0f} точек/с{eta}")
+
+
+# координатор: раз в interval секунд возвращает брошенные задания и печатает прогресс,
+# пока в свипе есть ожидающие или выполняемые задания
+def coordinate(db, sweep, interval=10.0, timeout=STALE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+    _require_postgres(db)
+    while True:
+        requeue_stale(db, timeout, max_attempts)
+        state = progress(db, sweep)
+        print(_progress_line(state))
+        if state["finished"] or state["total_points"] == 0:
+            return state
+        time.sleep(interval)
+
+
+# воркер: забирает задания по одному, пока они есть (wait=True - ждёт новых, опрашивая раз в poll
+# секунд). Фоновый поток обновляет heartbeat захваченного задания. store_points=True - результаты
+# точек пишутся в experiments (как у *_with_db.py), иначе только сводка в jobs.results
+class Worker:
+    def __init__(self, db, sweep=None, name=None, tol=1e-9, heartbeat=HEARTBEAT_INTERVAL,
+                 stale_timeout=STALE_TIMEOUT, max_attempts=MAX_ATTEMPTS, store_points=True):
+        _require_postgres(db)
+        self.db = db
+        self.sweep = sweep
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.tol = tol
+        self.heartbeat = heartbeat
+        self.stale_timeout = stale_timeout
+        self.max_attempts = max_attempts
+        self.store_points = store_points
+        self.current = set()
+        self.processed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def claim(self):
+        with self.db.connection() as conn, conn.cursor() as cursor, metrics.stage("db.execute.claim"):
+            cursor.execute(CLAIM_QUERY, (self.name, self.sweep, self.sweep))
+            return cursor.fetchone()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._lock:
+                ids = list(self.current)
+            if not ids:
+                continue
+            try:
+                with self.db.connection() as conn, conn.cursor() as cursor:
+                    cursor.execute(HEARTBEAT_QUERY, (ids, self.name))
+            except Exception as e:
+                print(f"Ошибка heartbeat: {e}", file=sys.stderr)
+
+    # анализ чанка и сохранение: строки experiments и отметка задания - одна транзакция
+    def process(self, job_id, sweep, family, description):
+        from psycopg2.extras import execute_values
+        params = job_points(description)
+        with metrics.stage("jobqueue.analyze"):
+            results = analyze_batch(FAMILIES[family](params), self.tol)
+        counts = {}
+        for code, count in zip(results["classification"].tolist(), results["entangled_count"].tolist()):
+            label = classification_label(code, count)
+            counts[label] = counts.get(label, 0) + 1
+
+        rows = []
+        if self.store_points:
+            names = PARAMETERS[family]
+            created_at = datetime.now()
+            for i, point in enumerate(params.tolist()):
+                parameters = dict(zip(names, point))
+                parameters["state_family"] = family
+                rows.append((f"Анализ 4-кубитного состояния {family}", f"свип {sweep}, задание {job_id}",
+                             json.dumps(parameters), "completed", created_at, json.dumps(point_results(results, i))))
+
+        with self.db.connection() as conn, conn.cursor() as cursor:
+            if rows:
+                with metrics.stage("db.execute.bulk_insert"):
+                    execute_values(cursor, BULK_INSERT_QUERY, rows, page_size=len(rows), fetch=True)
+            cursor.execute(COMPLETE_QUERY, (json.dumps(counts), job_id, self.name))
+            if cursor.rowcount != 1:
+                raise LostClaim(f"задание {job_id} уже передано другому воркеру")
+        metrics.count("db.rows_inserted", len(rows))
+        metrics.count("jobqueue.points", len(params))
+
+    def fail(self, job_id, error):
+        with self.db.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(FAIL_QUERY, (self.max_attempts, self.max_attempts, error, job_id, self.name))
+
+    # max_jobs - остановиться после стольких заданий; возвращает число обработанных
+    def run(self, max_jobs=None, wait=False, poll=5.0):
+        beat = threading.Thread(target=self._beat, daemon=True)
+        beat.start()
+        try:
+            while max_jobs is None or self.processed < max_jobs:
+                requeue_stale(self.db, self.stale_timeout, self.max_attempts)
+                job = self.claim()
+                if job is None:
+                    if not wait:
+                        break
+                    time.sleep(poll)
+                    continue
+                job_id, sweep, family, description, attempts = job
+                with self._lock:
+                    self.current.add(job_id)
+                try:
+                    self.process(job_id, sweep, family, description)
+                    self.processed += 1
+                    print(f"{self.name}: задание {job_id} ({sweep}, попытка {attempts}) выполнено")
+                except LostClaim as e:
+                    print(f"{self.name}: {e}", file=sys.stderr)
+                except Exception as e:
+                    print(f"{self.name}: ошибка задания {job_id}: {e}", file=sys.stderr)
+                    self.fail(job_id, str(e))
+                finally:
+                    with self._lock:
+                        self.current.discard(job_id)
+        finally:
+            self._stop.set()
+            beat.join()
+        return self.processed
+
+
+# ось из "имя=значение" или "имя=начало,конец,число" (linspace)
+def _axis(spec):
+    name, _, values = spec.partition("=")
+    values = [float(v) for v in values.split(",")]
+    if len(values) == 3:
+        return name, np.linspace(values[0], values[1], int(values[2]))
+    if len(values) == 1:
+        return name, np.array(values)
+    raise ValueError(f"ось задаётся как имя=значение или имя=начало,конец,число: {spec}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="распределённый свип через очередь заданий PostgreSQL")
+    parser.add_argument("--db", help="URL PostgreSQL (как QUANTUM_DB_URL; по умолчанию - из окружения)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="поставить свип по сетке в очередь")
+    enqueue_parser.add_argument("sweep")
+    enqueue_parser.add_argument("family", choices=sorted(FAMILIES))
+    enqueue_parser.add_argument("--axis", action="append", default=[], help="имя=значение или имя=начало,конец,число")
+    enqueue_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    worker_parser = commands.add_parser("worker", help="обрабатывать задания")
+    worker_parser.add_argument("--sweep", help="только задания этого свипа")
+    worker_parser.add_argument("--max-jobs", type=int)
+    worker_parser.add_argument("--wait", action="store_true", help="ждать новых заданий вместо выхода")
+    worker_parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_INTERVAL)
+    worker_parser.add_argument("--stale-timeout", type=float, default=STALE_TIMEOUT)
+    worker_parser.add_argument("--summary-only", action="store_true", help="не писать точки в experiments")
+
+    status_parser = commands.add_parser("status", help="прогресс свипа")
+    status_parser.add_argument("sweep")
+    status_parser.add_argument("--watch", action="store_true", help="координатор: следить до завершения")
+    status_parser.add_argument("--interval", type=float, default=10.0)
+    status_parser.add_argument("--stale-timeout", type=float, default=STALE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    with open_database(args.db) as db:
+        if args.command == "enqueue":
+            axes = dict(_axis(spec) for spec in args.axis)
+            names = PARAMETERS[args.family]
+            missing = [name for name in names if name not in axes]
+            if missing:
+                parser.error(f"не заданы оси: {', '.join(missing)}")
+            db.migrate()
+            enqueue(db, args.sweep, args.family, ParameterGrid(*[axes[name] for name in names]), args.chunk_size)
+        elif args.command == "worker":
+            worker = Worker(db, args.sweep, heartbeat=args.heartbeat, stale_timeout=args.stale_timeout,
+                            store_points=not args.summary_only)
+            worker.run(args.max_jobs, args.wait)
+            print(f"{worker.name}: обработано заданий {worker.processed}")
+        else:
+            _require_postgres(db)
+            state = coordinate(db, args.sweep, args.interval, args.stale_timeout) if args.watch \
+                else progress(db, args.sweep)
+            if not args.watch:
+                print(_progress_line(state))
+            for label, count in sweep_summary(db, args.sweep).items():
+                print(f"  {label}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import numpy as np
+
+from analytic import det2, det4
+
+# количественные меры запутанности для батчей: все ядра замкнутые и векторизованные по (N, ...)
+
+# sigma_y ⊗ sigma_y - вещественная симметричная матрица 4x4
+SIGMA_YY = np.kron(np.array([[0, -1j], [1j, 0]]), np.array([[0, -1j], [1j, 0]])).real
+
+# sigma_y^{⊗4} на векторе амплитуд: перестановка i -> 15 - i со знаком (-1)^(число единиц в i)
+_FLIP_SIGN = np.array([(-1) ** bin(i).count("1") for i in range(16)], dtype=float)
+
+# колонки мер в результатах анализа (analyze_batch(..., measures=True)): имя -> (форма, dtype)
+MEASURE_COLUMNS = {
+    "negativity": ((6,), np.float64),
+    "log_negativity": ((6,), np.float64),
+    "concurrence": ((6,), np.float64),
+    "one_tangles": ((4,), np.float64),
+    "four_tangle": ((), np.float64),
+    "invariants": ((3,), np.complex128)
+}
+
+
+# негативность пары: ||rho^{T_B}||_1 = 1 + 2|lambda_-|, у двух кубитов отрицательное собственное число одно
+def negativity(pt_negative):
+    return np.abs(np.minimum(pt_negative, 0.0))
+
+
+def log_negativity(pt_negative):
+    return np.log2(1.0 + 2.0 * negativity(pt_negative))
+
+
+# конкуренция Вуттерса из собственных чисел rho * rho~ (по убыванию): max(0, l1 - l2 - l3 - l4), l = sqrt(.)
+def _wootters(evals):
+    roots = np.sqrt(np.clip(evals, 0.0, None))
+    roots = -np.sort(-roots, axis=-1)
+    return np.clip(roots[..., 0] - roots[..., 1] - roots[..., 2] - roots[..., 3], 0.0, None)
+
+
+# конкуренция пар для чистого 4-кубитного состояния без матриц 4x4 пар: rho_pair = M M^+, где M -
+# матрица бипартиции (пара x остальные). Собственные числа rho rho~ совпадают с собственными числами
+# T^+ T, T = M^T (sigma_y ⊗ sigma_y) M - симметричная 4x4, так что хватает эрмитова eigvalsh
+def concurrence_pure(pair_m):
+    t = pair_m.swapaxes(-1, -2) @ SIGMA_YY @ pair_m
+    return _wootters(np.linalg.eigvalsh(t.conj().swapaxes(-1, -2) @ t))
+
+
+# у двух кубитов C > 0 тогда и только тогда, когда пара NPT: солвер нужен только запутанным парам
+# (маска entangled из PPT критерия), у остальных конкуренция 0
+def _masked(kernel, matrices, entangled):
+    values = np.zeros(entangled.shape)
+    if entangled.any():
+        values[entangled] = kernel(matrices[entangled])
+    return values
+
+
+# конкуренция произвольных (смешанных) матриц пар (..., 4, 4): собственные числа rho rho~ вещественны
+# и неотрицательны, но матрица не эрмитова - общий eigvals
+def concurrence(pairs):
+    flipped = SIGMA_YY @ pairs.conj() @ SIGMA_YY
+    return _wootters(np.linalg.eigvals(pairs @ flipped).real)
+
+
+# one-tangle кубита: 4 det(rho_i) (для чистого состояния - запутанность кубита с остальными)
+def one_tangles(singles):
+    return np.clip(4.0 * det2(singles).real, 0.0, None)
+
+
+# инвариант H = <psi*| sigma_y^{⊗4} |psi> = sum_i (-1)^|i| psi_i psi_{15-i}; 4-tangle = |H|^2
+def hyperdeterminant_h(amps):
+    return np.sum(_FLIP_SIGN * amps * amps[:, ::-1], axis=-1)
+
+
+def four_tangle(amps):
+    return np.abs(hyperdeterminant_h(amps)) ** 2
+
+
+# инварианты степени 4 (Luque, Thibon): L, M, N - определители amps как матриц 4x4
+# (AB|CD), (AC|DB), (AD|BC); при таком порядке столбцов L + M + N = 0
+def lmn_invariants(amps):
+    psi = amps.reshape(-1, 2, 2, 2, 2)
+    l = det4(psi.reshape(-1, 4, 4))
+    m = det4(psi.transpose(0, 1, 3, 4, 2).reshape(-1, 4, 4))
+    n = det4(psi.transpose(0, 1, 4, 2, 3).reshape(-1, 4, 4))
+    return np.stack([l, m, n], axis=-1)
+
+
+# все меры для батча чистых состояний; pair_m - матрицы бипартиции пар (N, 6, 4, 4), singles - (N, 4, 2, 2),
+# pt_negative и entangled (N, 6) - из PPT критерия analyze_batch
+def pure_measures(amps, pair_m, singles, pt_negative, entangled):
+    return {
+        "negativity": negativity(pt_negative),
+        "log_negativity": log_negativity(pt_negative),
+        "concurrence": _masked(concurrence_pure, pair_m, entangled),
+        "one_tangles": one_tangles(singles),
+        "four_tangle": four_tangle(amps),
+        "invariants": lmn_invariants(amps)
+    }
+
+
+# меры для смешанных состояний; полиномиальные инварианты чистых состояний не определены - NaN.
+# one-tangle тоже: 4 det(rho_i) смешанного состояния - лишь линейная энтропия кубита, а не tangle
+def density_measures(pairs, pt_negative, entangled):
+    n = len(pairs)
+    return {
+        "negativity": negativity(pt_negative),
+        "log_negativity": log_negativity(pt_negative),
+        "concurrence": _masked(concurrence, pairs, entangled),
+        "one_tangles": np.full((n, 4), np.nan),
+        "four_tangle": np.full(n, np.nan),
+        "invariants": np.full((n, 3), complex(np.nan, np.nan))
+    }
@@ -0,0 +1,145 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# QUANTUM_METRICS=1 включает сбор метрик в скриптах *_with_db.py (=memory - вместе с пиком памяти),
+# QUANTUM_PROFILE=путь.prof дополнительно пишет профиль cProfile (snakeviz, pstats)
+ENV_METRICS = "QUANTUM_METRICS"
+ENV_PROFILE = "QUANTUM_PROFILE"
+
+_NULL = nullcontext()
+
+# активный сборщик; None - инструментирование выключено и stage() возвращает пустой контекст
+_active = None
+
+
+# метрики запуска: суммарное время и число вызовов по именованным этапам, счётчики,
+# пик памяти tracemalloc (memory=True). Этапы могут быть вложенными и вызываться из
+# нескольких потоков (фоновый writer), время этапа - wall clock
+class Metrics:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+        self.peak_memory = None
+        self.started_at = None
+        self.elapsed = None
+        self._start = None
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        if elapsed is None and self._start is not None:
+            # метрики ещё идущего запуска (например, сохраняемые вместе с results)
+            elapsed = time.perf_counter() - self._start
+        with self._lock:
+            data = {
+                "elapsed": elapsed,
+                "stages": {
+                    name: {"seconds": self.timings[name], "calls": self.calls[name]}
+                    for name in sorted(self.timings, key=self.timings.get, reverse=True)
+                },
+                "counters": dict(self.counters)
+            }
+        peak_memory = self.peak_memory
+        if peak_memory is None and self.memory and tracemalloc.is_tracing():
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        if peak_memory is not None:
+            data["peak_memory_bytes"] = peak_memory
+        return data
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self):
+        data = self.to_dict()
+        lines = [f"Время запуска: {data['elapsed']:.6f} с" if data["elapsed"] is not None else "Метрики:"]
+        for name, stage in data["stages"].items():
+            lines.append(f"  {name:32s} {stage['seconds']:12.6f} с  вызовов: {stage['calls']}")
+        for name, value in data["counters"].items():
+            lines.append(f"  {name:32s} {value}")
+        if "peak_memory_bytes" in data:
+            lines.append(f"  пик памяти (tracemalloc): {data['peak_memory_bytes'] / 2 ** 20:.2f} МБ")
+        return "\n".join(lines)
+
+
+def active():
+    return _active
+
+
+# замер этапа активного сборщика; без сборщика - общий пустой контекст (одна проверка на вызов)
+def stage(name):
+    if _active is None:
+        return _NULL
+    return _active.stage(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+# включить сбор метрик на время блока: with collect(memory=True) as m: ...; m.to_dict().
+# profile=путь включает cProfile на тот же блок и сохраняет статистику в файл. Для py-spy
+# ничего включать не нужно: этапы - обычные вызовы функций и видны в стеке как есть
+@contextmanager
+def collect(metrics=None, memory=False, profile=None):
+    global _active
+    metrics = metrics or Metrics(memory)
+    previous = _active
+    _active = metrics
+    tracing = metrics.memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    metrics.started_at = time.time()
+    metrics._start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        metrics.elapsed = time.perf_counter() - metrics._start
+        if metrics.memory:
+            metrics.peak_memory = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+        _active = previous
+
+
+# collect() по переменным окружения QUANTUM_METRICS / QUANTUM_PROFILE; если обе не заданы - пустой контекст
+def collect_from_env():
+    profile = os.environ.get(ENV_PROFILE) or None
+    mode = os.environ.get(ENV_METRICS, "").lower()
+    if not profile and mode in ("", "0", "false", "no"):
+        return nullcontext()
+    return collect(memory=mode == "memory", profile=profile)
@@ -0,0 +1,10 @@
+-- исходная таблица экспериментов (как создавалась вручную по report.txt)
+CREATE TABLE IF NOT EXISTS experiments (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255),
+    description TEXT,
+    parameters JSON,
+    status VARCHAR(50),
+    created_at TIMESTAMP,
+    results JSON
+);
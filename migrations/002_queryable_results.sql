@@ -0,0 +1,68 @@
+-- JSONB вместо JSON/текста: индексируемые параметры и результаты
+ALTER TABLE experiments
+    ALTER COLUMN parameters TYPE JSONB USING parameters::text::jsonb,
+    ALTER COLUMN results TYPE JSONB USING results::text::jsonb;
+
+-- вычисляемые колонки поддерживаются сервером сами, код записи не меняется
+ALTER TABLE experiments
+    ADD COLUMN state_family TEXT GENERATED ALWAYS AS (parameters ->> 'state_family') STORED,
+    ADD COLUMN classification TEXT GENERATED ALWAYS AS (results ->> 'classification') STORED,
+    ADD COLUMN entangled_count INTEGER GENERATED ALWAYS AS ((results ->> 'entangled_count')::integer) STORED;
+
+CREATE INDEX IF NOT EXISTS experiments_state_family_idx ON experiments (state_family, status);
+CREATE INDEX IF NOT EXISTS experiments_classification_idx ON experiments (classification text_pattern_ops);
+CREATE INDEX IF NOT EXISTS experiments_entangled_count_idx ON experiments (entangled_count);
+CREATE INDEX IF NOT EXISTS experiments_parameters_idx ON experiments USING GIN (parameters jsonb_path_ops);
+
+-- диапазонные запросы по параметрам семейств. Нечисловые значения (комплексные коэффициенты
+-- пишутся строкой "(1+1j)") дают NULL, а не ошибку приведения на каждом INSERT
+CREATE INDEX IF NOT EXISTS experiments_param_a_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'a') = 'number' THEN (parameters ->> 'a')::double precision END));
+CREATE INDEX IF NOT EXISTS experiments_param_b_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'b') = 'number' THEN (parameters ->> 'b')::double precision END));
+CREATE INDEX IF NOT EXISTS experiments_param_c_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'c') = 'number' THEN (parameters ->> 'c')::double precision END));
+CREATE INDEX IF NOT EXISTS experiments_param_d_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'd') = 'number' THEN (parameters ->> 'd')::double precision END));
+
+-- результаты по парам кубитов отдельной таблицей
+CREATE TABLE IF NOT EXISTS pairwise_results (
+    experiment_id INTEGER NOT NULL REFERENCES experiments (id) ON DELETE CASCADE,
+    pair CHAR(2) NOT NULL,
+    entropy DOUBLE PRECISION,
+    entangled BOOLEAN,
+    pt_negative DOUBLE PRECISION,
+    PRIMARY KEY (experiment_id, pair)
+);
+
+CREATE INDEX IF NOT EXISTS pairwise_results_entropy_idx ON pairwise_results (pair, entropy);
+CREATE INDEX IF NOT EXISTS pairwise_results_entangled_idx ON pairwise_results (entangled, pair);
+
+-- pairwise_results заполняется триггером из results -> 'pairwise_entanglement'
+CREATE OR REPLACE FUNCTION sync_pairwise_results() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM pairwise_results WHERE experiment_id = NEW.id;
+    INSERT INTO pairwise_results (experiment_id, pair, entropy, entangled, pt_negative)
+    SELECT NEW.id,
+           p.key,
+           (p.value ->> 'entropy')::double precision,
+           (p.value ->> 'entangled')::boolean,
+           (p.value -> 'pt_negative_eigenvalues' ->> 0)::double precision
+    FROM jsonb_each(COALESCE(NEW.results -> 'pairwise_entanglement', '{}'::jsonb)) AS p;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER experiments_pairwise_results
+    AFTER INSERT OR UPDATE OF results ON experiments
+    FOR EACH ROW EXECUTE FUNCTION sync_pairwise_results();
+
+-- перенос уже сохранённых результатов
+INSERT INTO pairwise_results (experiment_id, pair, entropy, entangled, pt_negative)
+SELECT e.id,
+       p.key,
+       (p.value ->> 'entropy')::double precision,
+       (p.value ->> 'entangled')::boolean,
+       (p.value -> 'pt_negative_eigenvalues' ->> 0)::double precision
+FROM experiments AS e,
+     jsonb_each(COALESCE(e.results -> 'pairwise_entanglement', '{}'::jsonb)) AS p;
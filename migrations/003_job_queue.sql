@@ -0,0 +1,25 @@
+-- очередь заданий распределённого свипа: чанк параметров - строка jobs.
+-- pending -> running (захват воркером через FOR UPDATE SKIP LOCKED) -> completed / failed;
+-- running без heartbeat дольше таймаута возвращается в pending
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    sweep TEXT NOT NULL,
+    state_family TEXT NOT NULL,
+    -- {"points": [[...], ...]} или {"grid": [[ось], ...], "start": i, "stop": j} (срез ParameterGrid)
+    parameters JSONB NOT NULL,
+    points INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    claimed_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    error TEXT,
+    -- сводка чанка: число точек по классификациям
+    results JSONB
+);
+
+CREATE INDEX IF NOT EXISTS jobs_pending_idx ON jobs (sweep, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS jobs_running_idx ON jobs (heartbeat_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS jobs_sweep_status_idx ON jobs (sweep, status);
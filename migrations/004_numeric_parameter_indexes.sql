@@ -0,0 +1,15 @@
+-- индексы параметров из 002 в прежнем виде приводили (parameters ->> 'x')::double precision без проверки
+-- типа, и INSERT с комплексным коэффициентом ("(1+1j)") падал; пересоздаются в виде из 002
+DROP INDEX IF EXISTS experiments_param_a_idx;
+DROP INDEX IF EXISTS experiments_param_b_idx;
+DROP INDEX IF EXISTS experiments_param_c_idx;
+DROP INDEX IF EXISTS experiments_param_d_idx;
+
+CREATE INDEX experiments_param_a_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'a') = 'number' THEN (parameters ->> 'a')::double precision END));
+CREATE INDEX experiments_param_b_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'b') = 'number' THEN (parameters ->> 'b')::double precision END));
+CREATE INDEX experiments_param_c_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'c') = 'number' THEN (parameters ->> 'c')::double precision END));
+CREATE INDEX experiments_param_d_idx ON experiments
+    ((CASE WHEN jsonb_typeof(parameters -> 'd') = 'number' THEN (parameters ->> 'd')::double precision END));
@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+
+import metrics
+from explore import point_labels, region_label
+from families import get_family
+from sweep import analyze_batch
+
+# Монте-Карло по случайным параметрам семейства: батчи из воспроизводимого потока RNG (seed),
+# векторизованный анализ и накопление статистики в постоянной памяти - доли классов с интервалами
+# Уилсона, моменты энтропий (Уэлфорд), квантили по гистограммам фиксированных бинов.
+# состояние (вместе с состоянием генератора) периодически сохраняется в JSON, запуск продолжается
+# с того же места: python montecarlo.py G_abcd -n 1000000000 --checkpoint g_abcd_mc.json
+
+# z для доверительного интервала 95%
+Z95 = 1.959963984540054
+
+# энтропия кубита лежит в [0, 1], пары - в [0, 2]; бины гистограмм квантилей
+SINGLE_RANGE = (0.0, 1.0)
+PAIR_RANGE = (0.0, 2.0)
+DEFAULT_BINS = 10000
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+# интервал Уилсона для доли successes / n
+def wilson_interval(successes, n, z=Z95):
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+# онлайн-моменты по столбцам (Уэлфорд, объединение батчей по Чану): count, mean, m2, min, max
+class RunningMoments:
+    def __init__(self, width):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, values):
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.full(len(self.mean), np.nan)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+                "min": self.min.tolist(), "max": self.max.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls(len(data["mean"]))
+        moments.count = data["count"]
+        for name in ("mean", "m2", "min", "max"):
+            setattr(moments, name, np.array(data[name], dtype=float))
+        return moments
+
+
+# гистограммы по столбцам с фиксированными бинами на [low, high]: квантили с точностью до ширины бина
+class RunningHistogram:
+    def __init__(self, width, bins=DEFAULT_BINS, value_range=(0.0, 1.0)):
+        self.low, self.high = value_range
+        self.counts = np.zeros((width, bins), dtype=np.int64)
+
+    def update(self, values):
+        bins = self.counts.shape[1]
+        index = ((values - self.low) / (self.high - self.low) * bins).astype(np.int64)
+        index = np.clip(index, 0, bins - 1)
+        for column in range(self.counts.shape[0]):
+            self.counts[column] += np.bincount(index[:, column], minlength=bins)
+
+    # квантили (len(q), width): линейная интерполяция внутри бина
+    def quantiles(self, q):
+        bins = self.counts.shape[1]
+        edges = np.linspace(self.low, self.high, bins + 1)
+        result = np.full((len(q), self.counts.shape[0]), np.nan)
+        for column, counts in enumerate(self.counts):
+            total = counts.sum()
+            if total == 0:
+                continue
+            cumulative = np.cumsum(counts)
+            for i, level in enumerate(q):
+                target = level * total
+                k = min(int(np.searchsorted(cumulative, target)), bins - 1)
+                before = cumulative[k - 1] if k > 0 else 0
+                inside = (target - before) / counts[k] if counts[k] else 0.0
+                result[i, column] = edges[k] + inside * (edges[k + 1] - edges[k])
+        return result
+
+    def to_dict(self):
+        return {"range": [self.low, self.high], "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = np.array(data["counts"], dtype=np.int64)
+        histogram = cls(counts.shape[0], counts.shape[1], tuple(data["range"]))
+        histogram.counts = counts
+        return histogram
+
+
+# выборка: параметры семейства - независимые нормальные (complex_params - комплексные с
+# независимыми нормальными частями: гауссов вектор в линейной оболочке семейства).
+# поток не зависит от размера батча: каждая точка берёт из генератора подряд k (или 2k) чисел
+class MonteCarlo:
+    def __init__(self, family, complex_params=False, seed=0, bins=DEFAULT_BINS, tol=1e-9):
+        self.family = get_family(family).name
+        self.complex_params = complex_params
+        self.seed = seed
+        self.tol = tol
+        self.rng = np.random.default_rng(seed)
+        self.samples = 0
+        self.labels = {}
+        self.single_moments = RunningMoments(4)
+        self.pair_moments = RunningMoments(6)
+        self.single_histogram = RunningHistogram(4, bins, SINGLE_RANGE)
+        self.pair_histogram = RunningHistogram(6, bins, PAIR_RANGE)
+        self.elapsed = 0.0
+
+    def draw(self, n):
+        k = len(get_family(self.family).parameters)
+        if not self.complex_params:
+            return self.rng.standard_normal((n, k))
+        parts = self.rng.standard_normal((n, k, 2))
+        return parts[..., 0] + 1j * parts[..., 1]
+
+    def update(self, results):
+        labels, counts = np.unique(point_labels(results), return_counts=True)
+        for label, count in zip(labels.tolist(), counts.tolist()):
+            self.labels[label] = self.labels.get(label, 0) + count
+        valid = results["classification"] >= 0
+        singles = results["single_entropies"][valid]
+        pairs = results["pair_entropies"][valid]
+        self.single_moments.update(singles)
+        self.pair_moments.update(pairs)
+        self.single_histogram.update(singles)
+        self.pair_histogram.update(pairs)
+        self.samples += len(valid)
+
+    def step(self, n):
+        family = get_family(self.family)
+        with metrics.stage("montecarlo.draw"):
+            params = self.draw(n)
+        results = analyze_batch(family.amplitudes(params), self.tol)
+        with metrics.stage("montecarlo.aggregate"):
+            self.update(results)
+        metrics.count("montecarlo.samples", n)
+
+    # довести выборку до n_samples точек; checkpoint - путь файла состояния (продолжение с него
+    # делает load()), every - не реже раза в столько секунд. SIGTERM и Ctrl+C сохраняют состояние.
+    # сохраняется только снимок на границе батча: прерывание внутри step() могло сдвинуть генератор
+    # или частично применить update(), и продолжение с такого состояния пропустило бы точки
+    def run(self, n_samples, batch_size=65536, checkpoint=None, every=60.0, progress=None):
+        last_save = time.perf_counter()
+        start = time.perf_counter()
+        elapsed = self.elapsed
+        previous = snapshot = None
+        if checkpoint is not None:
+            previous = signal.signal(signal.SIGTERM, _terminate)
+            snapshot = self.state()
+        try:
+            while self.samples < n_samples:
+                self.step(min(batch_size, n_samples - self.samples))
+                self.elapsed = elapsed + time.perf_counter() - start
+                if checkpoint is not None:
+                    snapshot = self.state()
+                now = time.perf_counter()
+                if now - last_save >= every:
+                    if checkpoint is not None:
+                        self.save(checkpoint, snapshot)
+                    if progress is not None:
+                        progress(self)
+                    last_save = now
+        except BaseException:
+            if snapshot is not None:
+                self._restore(snapshot)
+            raise
+        finally:
+            if checkpoint is not None:
+                snapshot["elapsed"] = elapsed + time.perf_counter() - start
+                self.elapsed = snapshot["elapsed"]
+                self.save(checkpoint, snapshot)
+                signal.signal(signal.SIGTERM, previous)
+        return self.summary()
+
+    def state(self):
+        return {
+            "family": self.family,
+            "complex_params": self.complex_params,
+            "seed": self.seed,
+            "tol": self.tol,
+            "samples": self.samples,
+            "elapsed": self.elapsed,
+            "rng": self.rng.bit_generator.state,
+            "labels": {str(label): count for label, count in self.labels.items()},
+            "single_moments": self.single_moments.to_dict(),
+            "pair_moments": self.pair_moments.to_dict(),
+            "single_histogram": self.single_histogram.to_dict(),
+            "pair_histogram": self.pair_histogram.to_dict()
+        }
+
+    # атомарная запись: файл заменяется только целиком; state - ранее снятый снимок state()
+    def save(self, path, state=None):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state() if state is None else state, f)
+        os.replace(tmp, path)
+
+    def _restore(self, data):
+        self.rng.bit_generator.state = data["rng"]
+        self.samples = data["samples"]
+        self.elapsed = data["elapsed"]
+        self.labels = {int(label): count for label, count in data["labels"].items()}
+        self.single_moments = RunningMoments.from_dict(data["single_moments"])
+        self.pair_moments = RunningMoments.from_dict(data["pair_moments"])
+        self.single_histogram = RunningHistogram.from_dict(data["single_histogram"])
+        self.pair_histogram = RunningHistogram.from_dict(data["pair_histogram"])
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        sampler = cls(data["family"], data["complex_params"], data["seed"], tol=data["tol"])
+        sampler._restore(data)
+        return sampler
+
+    def summary(self):
+        classes = {}
+        for label, count in sorted(self.labels.items(), key=lambda item: -item[1]):
+            low, high = wilson_interval(count, self.samples)
+            classes[region_label(label)] = {"count": count, "fraction": count / self.samples if self.samples else 0.0,
+                                            "ci95": [low, high]}
+        return {
+            "family": self.family,
+            "complex_params": self.complex_params,
+            "seed": self.seed,
+            "samples": self.samples,
+            "elapsed": self.elapsed,
+            "classes": classes,
+            "single_entropies": _column_summary(self.single_moments, self.single_histogram),
+            "pair_entropies": _column_summary(self.pair_moments, self.pair_histogram)
+        }
+
+
+def _column_summary(moments, histogram):
+    quantiles = histogram.quantiles(QUANTILES)
+    return {
+        "mean": moments.mean.tolist(),
+        "std": moments.std.tolist(),
+        "min": moments.min.tolist(),
+        "max": moments.max.tolist(),
+        "quantiles": {str(q): row.tolist() for q, row in zip(QUANTILES, quantiles)}
+    }
+
+
+def _terminate(signum, frame):
+    # SIGTERM как Ctrl+C: run() сохраняет состояние в finally
+    raise KeyboardInterrupt
+
+
+def _print_summary(summary):
+    kind = "комплексные" if summary["complex_params"] else "вещественные"
+    print(f"{summary['family']}: {summary['samples']} точек ({kind} параметры, seed {summary['seed']}), "
+          f"{summary['elapsed']:.1f} с")
+    for label, data in summary["classes"].items():
+        low, high = data["ci95"]
+        print(f"  {label:32s} {data['fraction']:.6f}  [{low:.6f}, {high:.6f}]")
+    singles = summary["single_entropies"]
+    print("  энтропии кубитов (среднее ± ст. откл., медиана):")
+    for q, name in enumerate("ABCD"):
+        print(f"    {name}: {singles['mean'][q]:.6f} ± {singles['std'][q]:.6f}, {singles['quantiles']['0.5'][q]:.4f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Монте-Карло статистика классов и энтропий по случайным параметрам")
+    parser.add_argument("family", help="семейство состояний")
+    parser.add_argument("-n", "--samples", type=int, default=1000000)
+    parser.add_argument("--complex", action="store_true", help="комплексные коэффициенты")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-b", "--batch-size", type=int, default=65536)
+    parser.add_argument("--checkpoint", help="файл состояния: сохраняется периодически, при наличии - продолжение")
+    parser.add_argument("--every", type=float, default=60.0, help="период сохранения и вывода прогресса, с")
+    parser.add_argument("--json", help="записать итоговую сводку в JSON")
+    args = parser.parse_args(argv)
+
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        sampler = MonteCarlo.load(args.checkpoint)
+        if sampler.family != args.family:
+            parser.error(f"checkpoint {args.checkpoint} относится к семейству {sampler.family}")
+        print(f"продолжение с {sampler.samples} точек", file=sys.stderr)
+    else:
+        sampler = MonteCarlo(args.family, args.complex, args.seed)
+
+    def progress(current):
+        rate = current.samples / current.elapsed if current.elapsed else 0.0
+        print(f"  {current.samples}/{args.samples} точек, {rate:.0f} точек/с", file=sys.stderr)
+
+    try:
+        summary = sampler.run(args.samples, args.batch_size, args.checkpoint, args.every, progress)
+    except KeyboardInterrupt:
+        print(f"прервано на {sampler.samples} точках" + (", состояние сохранено" if args.checkpoint else ""),
+              file=sys.stderr)
+        return 130
+    _print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
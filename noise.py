@@ -0,0 +1,183 @@
+import numpy as np
+
+from analytic import partial_transpose_b, ppt_det_test
+from sweep import FAMILIES, SUBSYSTEMS, analyze_batch, density_matrices, pair_density_matrices
+
+# шумовые каналы для батчей матриц плотности n кубитов (N, 2^n, 2^n). Уровень шума p в [0, 1]
+# задаётся при применении - скаляром или массивом (N,), по значению на матрицу батча.
+# p = 0 - исходное состояние, p = 1 - полностью зашумлённое (каждый канал переводит затронутую пару в PPT)
+
+
+# белый шум: (1 - p) rho + p I / d
+class WhiteNoise:
+    name = "white"
+
+    def __init__(self, qubits=None):
+        # белый шум глобальный, qubits принимается для единообразия с локальными каналами
+        self.qubits = None
+
+    def apply(self, rho, p, qubits=None):
+        p = _level(p, rho)
+        dim = rho.shape[-1]
+        return (1 - p) * rho + p * np.eye(dim) / dim
+
+
+# локальный канал; qubits - номера кубитов 4-кубитной системы, на которые он действует (None - на все).
+# подкласс задаёт apply_qubit(view, p): действие на блоки 2x2 одного кубита, view (N, ..., 2, 2) -
+# представление матриц батча, меняется на месте; p (N, 1, ..., 1)
+class LocalChannel:
+    name = None
+
+    def __init__(self, qubits=None):
+        self.qubits = None if qubits is None else tuple(qubits)
+
+    # qubits - какие кубиты исходной системы лежат в rho (для пары - её два кубита)
+    def apply(self, rho, p, qubits=None):
+        n = int(round(np.log2(rho.shape[-1])))
+        qubits = tuple(range(n)) if qubits is None else tuple(qubits)
+        p = _level(p, rho)[:, 0, 0].reshape((-1,) + (1,) * (2 * n - 2))
+        t = rho.reshape((len(rho),) + (2,) * (2 * n)).copy()
+        for local, qubit in enumerate(qubits):
+            if self.qubits is None or qubit in self.qubits:
+                self.apply_qubit(np.moveaxis(t, [1 + local, 1 + n + local], [-2, -1]), p)
+        return t.reshape(rho.shape)
+
+
+# дефазировка: rho -> (1 - p/2) rho + (p/2) Z rho Z, внедиагональные элементы кубита умножаются на 1 - p
+class Dephasing(LocalChannel):
+    name = "dephasing"
+
+    def apply_qubit(self, view, p):
+        view[..., 0, 1] *= 1 - p
+        view[..., 1, 0] *= 1 - p
+
+
+# затухание амплитуды с вероятностью распада |1> -> |0> равной p
+class AmplitudeDamping(LocalChannel):
+    name = "amplitude_damping"
+
+    def apply_qubit(self, view, p):
+        view[..., 0, 0] += p * view[..., 1, 1]
+        view[..., 1, 1] *= 1 - p
+        view[..., 0, 1] *= np.sqrt(1 - p)
+        view[..., 1, 0] *= np.sqrt(1 - p)
+
+
+CHANNELS = {channel.name: channel for channel in (WhiteNoise, Dephasing, AmplitudeDamping)}
+
+
+def _level(p, rho):
+    p = np.broadcast_to(np.asarray(p, dtype=float), rho.shape[:1])
+    return p[:, None, None]
+
+
+# каналы из строк вида "white", "dephasing", "amplitude_damping:0,2" (после двоеточия - кубиты)
+def parse_channels(specs):
+    channels = []
+    for spec in specs:
+        name, _, qubits = spec.partition(":")
+        if name not in CHANNELS:
+            raise ValueError(f"неизвестный канал шума: {name}; доступны: {', '.join(CHANNELS)}")
+        qubits = [int(q) for q in qubits.split(",")] if qubits else None
+        channels.append(CHANNELS[name](qubits))
+    return channels
+
+
+# последовательное применение каналов с общим уровнем шума p
+def apply_channels(rho, channels, p, qubits=None):
+    for channel in channels:
+        rho = channel.apply(rho, p, qubits)
+    return rho
+
+
+# зашумлённые матрицы плотности (N, 16, 16) для амплитуд (N, 16)
+def noisy_density_matrices(amps, channels, p):
+    return apply_channels(density_matrices(amps), channels, p)
+
+
+# анализ смешанных состояний: каналы с уровнем p к состояниям семейства, затем общий путь
+# analyze_batch для матриц плотности (критерии те же, что для чистых состояний)
+def noisy_sweep(family, params, channels, p, tol=1e-9, chunk_size=4096):
+    params = np.atleast_2d(np.asarray(params))
+    p = np.broadcast_to(np.asarray(p, dtype=float), params.shape[:1])
+    parts = []
+    for start in range(0, len(params), chunk_size):
+        stop = start + chunk_size
+        amps = FAMILIES[family](params[start:stop])
+        valid = np.all(np.isfinite(amps), axis=1)
+        rho = np.full((len(amps), 16, 16), np.nan, dtype=complex)
+        rho[valid] = noisy_density_matrices(amps[valid], channels, p[start:stop][valid])
+        parts.append(analyze_batch(rho, tol))
+    results = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    results["parameters"] = params
+    results["noise"] = p
+    return results
+
+
+# шум для пар, упорядоченных по подсистемам: bounds - границы срезов подсистем SUBSYSTEMS
+def _apply_pairs(targets, channels, p, bounds):
+    noisy = np.empty_like(targets)
+    for k, qubits in enumerate(SUBSYSTEMS.values()):
+        part = slice(bounds[k], bounds[k + 1])
+        if bounds[k] < bounds[k + 1]:
+            noisy[part] = apply_channels(targets[part], channels, p[part], qubits)
+    return noisy
+
+
+# та же граница, что у analyze_batch: знак det(rho^{T_B}), а в пределах tol от нуля - минимальное
+# собственное число. Около порога det мал почти всегда (при затухании амплитуды к нулю стремятся
+# и остальные собственные числа), поэтому общий солвер там обязателен
+def _npt(pairs, tol):
+    entangled, uncertain, _ = ppt_det_test(pairs, tol)
+    if uncertain.any():
+        entangled[uncertain] = np.linalg.eigvalsh(partial_transpose_b(pairs[uncertain]))[..., 0] < -tol
+    return entangled
+
+
+# критический уровень шума для каждой пары: наименьшее p, при котором пара перестаёт быть
+# PPT-запутанной. Каналы локальные или белый шум, поэтому редуцированная матрица пары после шума -
+# это шум, применённый к матрице пары 4x4: 16x16 не строится, ptrace не повторяется.
+# PPT-множество выпукло и не расширяется под действием этих каналов, так что запутанность монотонна
+# по p, и для всех пар батча сразу идёт векторизованная бисекция по p (матрицы 4x4).
+# для одного белого шума порог точный: p* = -l / (1/4 - l), l - отрицательное собственное число rho^{T_B}.
+# возвращает critical_noise (N, 6): 0 для пар, не запутанных без шума, inf - если пара запутана и при p = 1
+# (каналы не задевают её кубиты), NaN для невалидных точек
+def critical_noise(family, params, channels, tol=1e-9, iterations=32):
+    params = np.atleast_2d(np.asarray(params))
+    amps = FAMILIES[family](params)
+    clean = analyze_batch(amps, tol)
+    entangled = clean["entangled"]
+    valid = np.all(np.isfinite(amps), axis=1)
+    critical = np.zeros(entangled.shape)
+    critical[~valid] = np.nan
+
+    if valid.any() and entangled.any():
+        pairs = np.full(entangled.shape + (4, 4), np.nan, dtype=complex)
+        pairs[valid] = pair_density_matrices(amps[valid])
+        rows, cols = np.nonzero(entangled)
+        # пары одной подсистемы подряд: каналу нужны номера кубитов пары, срезы вместо масок
+        order = np.argsort(cols, kind='stable')
+        rows, cols = rows[order], cols[order]
+        bounds = np.searchsorted(cols, np.arange(len(SUBSYSTEMS) + 1))
+        targets = pairs[rows, cols]
+
+        if len(channels) == 1 and isinstance(channels[0], WhiteNoise):
+            negative = clean["pt_negative"][rows, cols]
+            critical[rows, cols] = -negative / (0.25 - negative)
+        else:
+            lo = np.zeros(len(targets))
+            hi = np.ones(len(targets))
+            survives = _npt(_apply_pairs(targets, channels, hi, bounds), tol)
+            for _ in range(iterations):
+                mid = (lo + hi) / 2.0
+                still = _npt(_apply_pairs(targets, channels, mid, bounds), tol)
+                lo = np.where(still, mid, lo)
+                hi = np.where(still, hi, mid)
+            critical[rows, cols] = np.where(survives, np.inf, (lo + hi) / 2.0)
+
+    return {
+        "parameters": params,
+        "entangled": entangled,
+        "critical_noise": critical,
+        "classification": clean["classification"]
+    }
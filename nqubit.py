@@ -0,0 +1,233 @@
+import itertools
+from math import comb
+
+import numpy as np
+
+from quantum_tools import entropy
+from sweep import FULLY_SEPARABLE, GHZ_TYPE, INVALID, W_TYPE, ppt_pairs
+
+# анализ n-кубитных состояний (n ~ 5-12) без матриц плотности 2^n x 2^n: состояние хранится
+# разреженно - индексы базисных векторов и амплитуды ненулевых компонент. Кубит 0 - старший бит
+# индекса (как у tensor() и bin(i)[2:].zfill(n) в 4-кубитном коде)
+
+
+class SparseState:
+    def __init__(self, n, indices, amplitudes):
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        amplitudes = np.asarray(amplitudes, dtype=complex).ravel()
+        if len(indices) != len(amplitudes):
+            raise ValueError("число индексов и амплитуд не совпадает")
+        if len(indices) and (indices.min() < 0 or indices.max() >= 2 ** n):
+            raise ValueError(f"индекс базисного вектора вне диапазона [0, 2^{n})")
+        # повторяющиеся индексы складываются, нулевые амплитуды отбрасываются
+        indices, inverse = np.unique(indices, return_inverse=True)
+        summed = np.zeros(len(indices), dtype=complex)
+        np.add.at(summed, inverse, amplitudes)
+        nonzero = summed != 0
+        self.n = n
+        self.indices = indices[nonzero]
+        self.amplitudes = summed[nonzero]
+
+    @classmethod
+    def from_dense(cls, amplitudes):
+        amplitudes = np.asarray(amplitudes, dtype=complex).ravel()
+        n = int(round(np.log2(len(amplitudes))))
+        if 2 ** n != len(amplitudes):
+            raise ValueError(f"длина вектора амплитуд {len(amplitudes)} - не степень двойки")
+        indices = np.flatnonzero(amplitudes)
+        return cls(n, indices, amplitudes[indices])
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def __repr__(self):
+        return f"SparseState(n={self.n}, nnz={self.nnz})"
+
+    def norm(self):
+        return float(np.linalg.norm(self.amplitudes))
+
+    def unit(self):
+        norm = self.norm()
+        if norm == 0:
+            raise ValueError("нулевое состояние нельзя нормировать")
+        return SparseState(self.n, self.indices, self.amplitudes / norm)
+
+    def to_dense(self):
+        dense = np.zeros(2 ** self.n, dtype=complex)
+        dense[self.indices] = self.amplitudes
+        return dense
+
+    # биты индексов по кубитам: (nnz, len(qubits)), кубит 0 - старший бит
+    def bits(self, qubits):
+        shifts = self.n - 1 - np.asarray(qubits, dtype=np.int64)
+        return (self.indices[:, None] >> shifts) & 1
+
+
+# номер базисного вектора подсистемы qubits по битам (кубит qubits[0] - старший)
+def _subindex(state, qubits):
+    bits = state.bits(qubits)
+    weights = 1 << np.arange(len(qubits) - 1, -1, -1, dtype=np.int64)
+    return bits @ weights
+
+
+def _rest(n, keep):
+    return [q for q in range(n) if q not in keep]
+
+
+# сжатая матрица бипартиции (keep | остальные): строки и столбцы - только встречающиеся базисные
+# векторы подсистем, поэтому размер не больше nnz x nnz, а не 2^k x 2^(n-k).
+# возвращает (M, номера строк в базисе keep)
+def compact_bipartition(state, keep):
+    keep = list(keep)
+    rows, row_inverse = np.unique(_subindex(state, keep), return_inverse=True)
+    cols, col_inverse = np.unique(_subindex(state, _rest(state.n, keep)), return_inverse=True)
+    m = np.zeros((len(rows), len(cols)), dtype=complex)
+    # каждый базисный вектор задаёт единственную пару (строка, столбец)
+    m[row_inverse, col_inverse] = state.amplitudes
+    return m, rows
+
+
+# ненулевая часть спектра редуцированного состояния keep (по убыванию) - квадраты сингулярных чисел
+# сжатой матрицы бипартиции; считаются как собственные числа меньшей из матриц Грама M M^+ / M^+ M
+def bipartition_spectrum(state, keep):
+    m, _ = compact_bipartition(state, keep)
+    gram = m @ m.conj().T if m.shape[0] <= m.shape[1] else m.conj().T @ m
+    return np.linalg.eigvalsh(gram)[::-1]
+
+
+def bipartition_entropy(state, keep):
+    return entropy(bipartition_spectrum(state, keep))
+
+
+# плотная редуцированная матрица 2^k x 2^k подсистемы keep (для малых k): строки сжатой матрицы
+# раскладываются по своим номерам в базисе keep
+def reduced_density(state, keep):
+    m, rows = compact_bipartition(state, keep)
+    dim = 2 ** len(keep)
+    rho = np.zeros((dim, dim), dtype=complex)
+    rho[np.ix_(rows, rows)] = m @ m.conj().T
+    return rho
+
+
+# все k-частичные подсистемы n кубитов
+def reductions(n, k):
+    return list(itertools.combinations(range(n), k))
+
+
+# все бипартиции n кубитов по одному разу: меньшая часть (при равных - содержащая кубит 0)
+def bipartitions(n):
+    parts = []
+    for k in range(1, n // 2 + 1):
+        for keep in itertools.combinations(range(n), k):
+            if 2 * k < n or keep[0] == 0:
+                parts.append(keep)
+    return parts
+
+
+# энтропии всех бипартиций: {keep: S}. Число бипартиций 2^(n-1) - 1, каждая - одна сжатая матрица
+def bipartition_entropies(state):
+    return {keep: bipartition_entropy(state, keep) for keep in bipartitions(state.n)}
+
+
+# редуцированные матрицы k-частичных подсистем (C(n, k), 2^k, 2^k) и их имена
+def k_body_density(state, k):
+    subsets = reductions(state.n, k)
+    return subsets, np.stack([reduced_density(state, keep) for keep in subsets])
+
+
+def _pair_name(pair):
+    return f"{pair[0]}-{pair[1]}"
+
+
+# анализ n-кубитного состояния теми же критериями, что и 4-кубитный main():
+# энтропии кубитов, энтропии и PPT тест всех пар (4x4 через analytic), классификация
+# (W_TYPE - запутаны все C(n, 2) пар). Невалидное (нулевое или с NaN) состояние - INVALID
+def analyze_sparse(state, tol=1e-9):
+    n = state.n
+    pairs = reductions(n, 2)
+    if state.nnz == 0 or not np.all(np.isfinite(state.amplitudes)):
+        return {
+            "n": n,
+            "pairs": [_pair_name(p) for p in pairs],
+            "single_entropies": np.full(n, np.nan),
+            "pair_entropies": np.full(len(pairs), np.nan),
+            "pt_negative": np.full(len(pairs), np.nan),
+            "entangled": np.zeros(len(pairs), dtype=bool),
+            "entangled_count": INVALID,
+            "fully_separable": False,
+            "classification": INVALID
+        }
+    state = state.unit()
+
+    # матрицы кубитов 2x2 и пар 4x4 - из сжатых матриц бипартиции, 2^n x 2^n не строится
+    singles = np.stack([reduced_density(state, [q]) for q in range(n)])
+    single_entropies = entropy(np.linalg.eigvalsh(singles))
+
+    _, pair_rho = k_body_density(state, 2)
+    pair_entropies = entropy(np.linalg.eigvalsh(pair_rho))
+
+    entangled, pt_negative = ppt_pairs(pair_rho, tol)
+
+    fully_separable = bool(np.all(np.abs(single_entropies) < tol))
+    entangled_count = int(entangled.sum())
+    if fully_separable:
+        classification = FULLY_SEPARABLE
+    elif entangled_count == len(pairs):
+        classification = W_TYPE
+    else:
+        classification = GHZ_TYPE
+    return {
+        "n": n,
+        "pairs": [_pair_name(p) for p in pairs],
+        "single_entropies": single_entropies,
+        "pair_entropies": pair_entropies,
+        "pt_negative": pt_negative,
+        "entangled": entangled,
+        "entangled_count": entangled_count,
+        "fully_separable": fully_separable,
+        "classification": classification
+    }
+
+
+# стандартные семейства n кубитов
+
+
+# (|0...0> + |1...1>) / sqrt(2)
+def ghz(n):
+    return SparseState(n, [0, 2 ** n - 1], np.full(2, 2 ** -0.5))
+
+
+# симметричное состояние Дике с k возбуждениями: равная суперпозиция C(n, k) базисных векторов
+def dicke(n, k):
+    if not 0 <= k <= n:
+        raise ValueError(f"число возбуждений должно быть от 0 до {n}, получено {k}")
+    indices = [sum(1 << (n - 1 - q) for q in ones) for ones in itertools.combinations(range(n), k)]
+    return SparseState(n, indices, np.full(len(indices), comb(n, k) ** -0.5))
+
+
+def w(n):
+    return dicke(n, 1)
+
+
+# линейное кластерное состояние: CZ соседних кубитов к |+>^n, амплитуды (-1)^(sum x_i x_{i+1}) / 2^(n/2)
+# (все 2^n амплитуд ненулевые - разреженность не помогает, но матрицы бипартиции по-прежнему сжатые)
+def cluster(n):
+    indices = np.arange(2 ** n, dtype=np.int64)
+    neighbours = indices & (indices >> 1)
+    parity = np.array([bin(v).count("1") & 1 for v in neighbours.tolist()])
+    return SparseState(n, indices, (1 - 2 * parity) * 2 ** (-n / 2))
+
+
+def main():
+    for n in (5, 8, 12):
+        for name, state in (("GHZ", ghz(n)), ("W", w(n)), ("Dicke k=2", dicke(n, 2)), ("cluster", cluster(n))):
+            results = analyze_sparse(state)
+            half = bipartition_entropy(state, range(n // 2))
+            print(f"n={n:2d} {name:10s} nnz={state.nnz:5d} "
+                  f"S(кубит 0)={results['single_entropies'][0]:.4f} S(половина)={half:.4f} "
+                  f"запутанных пар {results['entangled_count']}/{len(results['pairs'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+import numpy as np
+
+import metrics
+from analytic import partial_transpose_b
+from families import get_family
+from quantum_tools import EIGENVALUE_TOL, entropy
+from sweep import (FULLY_SEPARABLE, GHZ_TYPE, SUBSYSTEMS, W_TYPE, analyze_batch, bipartition_matrices,
+                   point_results)
+
+# оптимизация мер запутанности по параметрам семейства: максимум/минимум энтропий и негативности
+# подсистем многостартовым L-BFGS. Все старты идут одним батчем, градиент аналитический:
+# спектральная функция -> матрица Грама бипартиции -> амплитуды -> нормировка -> линейное
+# отображение параметров семейства (параметры вещественные)
+
+KINDS = ("entropy", "negativity")
+QUBITS = "ABCD"
+
+# требование к классификации найденного оптимума
+CLASSES = {
+    "fully_separable": FULLY_SEPARABLE,
+    "W": W_TYPE,
+    "GHZ": GHZ_TYPE
+}
+
+_LN2 = np.log(2.0)
+
+# во сколько раз больше случайных точек берётся для отбора стартов нужного класса
+_OVERSAMPLE = 16
+
+
+# подсистема по буквам: "AB" -> (0, 1)
+def _subsystem(letters):
+    if not letters or any(q not in QUBITS for q in letters) or len(set(letters)) != len(letters):
+        raise ValueError(f"неверная подсистема: {letters!r}; ожидаются буквы из {QUBITS}")
+    return tuple(sorted(QUBITS.index(q) for q in letters))
+
+
+# цель из строк "kind:подсистема": "entropy:A", "entropy:AB", "negativity:AC", "entropy:pairs"
+# (сумма по всем парам), "entropy:qubits" (по всем кубитам), "negativity:pairs".
+# target - строка или словарь {строка: вес} для взвешенной суммы. Возвращает [(kind, кубиты, вес)]
+def parse_target(target):
+    if isinstance(target, str):
+        target = {target: 1.0}
+    terms = []
+    for spec, weight in target.items():
+        kind, _, subsystem = spec.partition(":")
+        if kind not in KINDS:
+            raise ValueError(f"неизвестная мера: {kind}; доступны: {', '.join(KINDS)}")
+        if subsystem == "pairs":
+            keeps = list(SUBSYSTEMS.values())
+        elif subsystem == "qubits" and kind == "entropy":
+            keeps = [(q,) for q in range(4)]
+        else:
+            keeps = [_subsystem(subsystem)]
+        for keep in keeps:
+            if kind == "negativity" and len(keep) != 2:
+                raise ValueError(f"негативность определена для пар кубитов, получено: {spec}")
+            terms.append((kind, keep, float(weight)))
+    return terms
+
+
+# энтропия и её градиент по матрице rho: dS = Tr(G drho), G = -U diag(log2 l + 1/ln2) U^+
+def _entropy_grad(rho):
+    evals, vecs = np.linalg.eigh(rho)
+    weights = -(np.log2(np.clip(evals, EIGENVALUE_TOL, None)) + 1.0 / _LN2)
+    grad = (vecs * weights[..., None, :]) @ vecs.conj().swapaxes(-1, -2)
+    return entropy(evals), grad
+
+
+# негативность пары |l_min(rho^{T_B})| и градиент: dl = v^+ drho^{T_B} v = Tr((v v^+)^{T_B} drho)
+def _negativity_grad(rho):
+    evals, vecs = np.linalg.eigh(partial_transpose_b(rho))
+    v = vecs[..., :, 0]
+    negative = evals[..., 0] < 0
+    projector = v[..., :, None] * v.conj()[..., None, :]
+    grad = -partial_transpose_b(projector) * negative[..., None, None]
+    return np.where(negative, -evals[..., 0], 0.0), grad
+
+
+# градиент по матрице бипартиции (N, 2^k, 2^(4-k)) обратно в амплитуды (N, 16)
+def _unfold(grad_m, keep):
+    order = list(keep) + [q for q in range(4) if q not in keep]
+    psi = grad_m.reshape((-1,) + (2,) * 4)
+    return psi.transpose([0] + [1 + q for q in np.argsort(order)]).reshape(len(grad_m), 16)
+
+
+# значение цели (N,) и градиент df = Re <g, dpsi> по нормированным амплитудам (N, 16).
+# rho = M M^+, поэтому df = Tr(G drho) = 2 Re <G M, dM>
+def objective(terms, amps):
+    value = np.zeros(len(amps))
+    grad = np.zeros(amps.shape, dtype=complex)
+    for kind, keep, weight in terms:
+        m = bipartition_matrices(amps, list(keep))
+        rho = m @ m.conj().swapaxes(-1, -2)
+        v, g = _entropy_grad(rho) if kind == "entropy" else _negativity_grad(rho)
+        value += weight * v
+        grad += weight * _unfold(2.0 * g @ m, keep)
+    return value, grad
+
+
+# цель и градиент по параметрам семейства (N, k): psi = phi / |phi|, phi = params @ A^T + offset
+def parameter_objective(family, terms, params):
+    family = get_family(family) if isinstance(family, str) else family
+    phi = params @ family.matrix.T + family.offset
+    norms = np.linalg.norm(phi, axis=1, keepdims=True)
+    amps = phi / norms
+    value, grad = objective(terms, amps)
+    overlap = np.sum(amps.conj() * grad, axis=1, keepdims=True).real
+    grad_phi = (grad - amps * overlap) / norms
+    return value, (grad_phi.conj() @ family.matrix).real
+
+
+# батч-L-BFGS (минимизация) для независимых задач: x0 (S, k), fun(x) -> (f (S,), g (S, k)).
+# у каждого старта своя история из memory пар (s, y) и свой шаг; шаг подбирается возвратом
+# по условию Армихо, на каждой пробе вычисляются только ещё не принятые старты.
+# feasible(x) -> (S,) bool - необязательное ограничение: пробные точки вне допустимой области
+# отвергаются так же, как не прошедшие Армихо (старты должны начинаться внутри неё).
+# возвращает (x, f, g, сошлись, итераций, вычислений точек)
+def lbfgs(fun, x0, max_iter=200, memory=8, gtol=1e-6, ftol=1e-12, max_backtracks=30, feasible=None):
+    x = np.array(x0, dtype=float)
+    n, k = x.shape
+    f, g = fun(x)
+    evaluations = n
+    s_hist = np.zeros((memory, n, k))
+    y_hist = np.zeros((memory, n, k))
+    # rho = 1 / (y s); 0 - пустая ячейка истории (не влияет на направление)
+    rho_hist = np.zeros((memory, n))
+    head = np.zeros(n, dtype=np.int64)
+    columns = np.arange(n)
+    gamma = 1.0 / np.maximum(np.linalg.norm(g, axis=1), 1.0)
+    converged = np.linalg.norm(g, axis=1) <= gtol
+    active = ~converged & np.isfinite(f)
+    iterations = np.zeros(n, dtype=np.int64)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        # двухпетлевая рекурсия сразу для всех стартов
+        q = g.copy()
+        alpha = np.zeros((memory, n))
+        for j in range(memory):
+            slot = (head - 1 - j) % memory
+            alpha[j] = rho_hist[slot, columns] * np.sum(s_hist[slot, columns] * q, axis=1)
+            q -= alpha[j][:, None] * y_hist[slot, columns]
+        r = gamma[:, None] * q
+        for j in reversed(range(memory)):
+            slot = (head - 1 - j) % memory
+            beta = rho_hist[slot, columns] * np.sum(y_hist[slot, columns] * r, axis=1)
+            r += s_hist[slot, columns] * (alpha[j] - beta)[:, None]
+        d = -r
+        slope = np.sum(g * d, axis=1)
+        # не направление спуска - антиградиент
+        uphill = ~(slope < 0)
+        d[uphill] = -g[uphill]
+        slope[uphill] = -np.sum(g[uphill] ** 2, axis=1)
+
+        step = np.ones(n)
+        pending = active.copy()
+        new_x, new_f, new_g = x.copy(), f.copy(), g.copy()
+        for _ in range(max_backtracks):
+            rows = np.flatnonzero(pending)
+            if not len(rows):
+                break
+            trial = x[rows] + step[rows, None] * d[rows]
+            trial_f, trial_g = fun(trial)
+            evaluations += len(rows)
+            ok = np.isfinite(trial_f) & (trial_f <= f[rows] + 1e-4 * step[rows] * slope[rows])
+            if feasible is not None and ok.any():
+                ok[ok] = feasible(trial[ok])
+            accepted = rows[ok]
+            new_x[accepted], new_f[accepted], new_g[accepted] = trial[ok], trial_f[ok], trial_g[ok]
+            pending[accepted] = False
+            step[rows[~ok]] *= 0.5
+        # шаг не найден - старт останавливается в текущей точке
+        moved = active & ~pending
+        active &= ~pending
+
+        s = new_x - x
+        y = new_g - g
+        sy = np.sum(s * y, axis=1)
+        update = np.flatnonzero(moved & (sy > 1e-16))
+        slot = head[update]
+        s_hist[slot, update] = s[update]
+        y_hist[slot, update] = y[update]
+        rho_hist[slot, update] = 1.0 / sy[update]
+        head[update] = (head[update] + 1) % memory
+        gamma[update] = sy[update] / np.sum(y[update] ** 2, axis=1)
+
+        decrease = f - new_f
+        x, f, g = new_x, new_f, new_g
+        iterations[moved] += 1
+        small_grad = np.linalg.norm(g, axis=1) <= gtol
+        stalled = moved & (decrease <= ftol * (1.0 + np.abs(f)))
+        converged |= active & (small_grad | stalled)
+        active &= ~(small_grad | stalled)
+
+    return x, f, g, converged, iterations, evaluations
+
+
+def _require_code(require):
+    if require is None:
+        return None
+    if require in CLASSES:
+        return CLASSES[require]
+    if require in CLASSES.values():
+        return require
+    raise ValueError(f"неизвестный класс: {require}; доступны: {', '.join(CLASSES)}")
+
+
+# оптимум цели target (см. parse_target) по параметрам семейства family.
+# fixed = {имя: значение} закрепляет параметры, остальные свободны. starts - число случайных стартов
+# (нормальное распределение, seed) или массив начальных точек по свободным параметрам (S, k_free).
+# require - класс ("W", "GHZ", "fully_separable" или код): оптимум ищется внутри области этого класса -
+# старты отбираются из случайных точек класса, шаги за её границу отвергаются (классификация пробных
+# точек - analyze_batch). Возвращает словарь: лучшая точка (parameters, value, results в формате main();
+# None, если допустимых стартов нет) и итоги всех стартов
+def optimize(family, target, maximize=True, fixed=None, starts=16, seed=0, require=None, tol=1e-9,
+             max_iter=200, memory=8, gtol=1e-6):
+    family = get_family(family)
+    terms = parse_target(target)
+    code = _require_code(require)
+    fixed = dict(fixed or {})
+    names = family.parameters
+    unknown = [name for name in fixed if name not in names]
+    if unknown:
+        raise ValueError(f"параметры {family.name}: {', '.join(names)}; неизвестны: {', '.join(unknown)}")
+    free = [name for name in names if name not in fixed]
+    columns = [names.index(name) for name in free]
+    template = np.array([fixed.get(name, 0.0) for name in names], dtype=float)
+    sign = -1.0 if maximize else 1.0
+
+    def full(x):
+        params = np.tile(template, (len(x), 1))
+        params[:, columns] = x
+        return params
+
+    def feasible(x):
+        with metrics.stage("optimize.classify"):
+            return analyze_batch(family.amplitudes(full(x)), tol)["classification"] == code
+
+    if np.ndim(starts) == 0:
+        # для ограничения по классу - с запасом, из которого берутся точки класса
+        oversample = 1 if code is None else _OVERSAMPLE
+        x0 = np.random.default_rng(seed).normal(size=(int(starts) * oversample, len(free)))
+        if code is not None:
+            x0 = x0[feasible(x0)][:int(starts)]
+    else:
+        x0 = np.atleast_2d(np.asarray(starts, dtype=float))
+        if code is not None:
+            x0 = x0[feasible(x0)]
+
+    def fun(x):
+        with metrics.stage("optimize.evaluate"):
+            value, grad = parameter_objective(family, terms, full(x))
+        metrics.count("optimize.evaluations", len(x))
+        return sign * value, sign * grad[:, columns]
+
+    x, f, _, converged, iterations, evaluations = lbfgs(fun, x0, max_iter, memory, gtol,
+                                                        feasible=None if code is None else feasible)
+    params = full(x)
+    values = sign * f
+    analysis = analyze_batch(family.amplitudes(params), tol)
+    allowed = np.isfinite(values)
+    if code is not None:
+        allowed &= analysis["classification"] == code
+
+    best = None
+    if allowed.any():
+        candidates = np.flatnonzero(allowed)
+        best = int(candidates[np.argmin(f[candidates])])
+    return {
+        "family": family.name,
+        "target": target,
+        "maximize": maximize,
+        "parameters": params[best] if best is not None else None,
+        "value": float(values[best]) if best is not None else None,
+        "results": point_results(analysis, best) if best is not None else None,
+        "start_parameters": params,
+        "start_values": values,
+        "classification": analysis["classification"],
+        "converged": converged,
+        "iterations": iterations,
+        "evaluations": evaluations
+    }
+
+
+def maximize(family, target, **kwargs):
+    return optimize(family, target, maximize=True, **kwargs)
+
+
+def minimize(family, target, **kwargs):
+    return optimize(family, target, maximize=False, **kwargs)
+
+
+def _print(title, result):
+    print(f"\n{title}")
+    if result["parameters"] is None:
+        print("  нет стартов, удовлетворяющих требованию")
+        return
+    params = ", ".join(f"{name} = {value:.6f}" for name, value in
+                       zip(get_family(result["family"]).parameters, result["parameters"]))
+    print(f"  {params}")
+    print(f"  значение: {result['value']:.10f}; класс: {result['results']['classification']}")
+    print(f"  стартов: {len(result['start_values'])}, сошлось: {int(result['converged'].sum())}, "
+          f"итераций (макс.): {int(result['iterations'].max())}, вычислений точек: {result['evaluations']}")
+
+
+def main():
+    print("=" * 70)
+    print("ОПТИМИЗАЦИЯ ЗАПУТАННОСТИ ПО ПАРАМЕТРАМ СЕМЕЙСТВ")
+    print("=" * 70)
+    _print("G_abcd: максимум негативности пары AB", maximize("G_abcd", "negativity:AB"))
+    _print("G_abcd: максимум суммы энтропий пар", maximize("G_abcd", "entropy:pairs"))
+    _print("L_abc2 (c = 0.5): максимум энтропии AC среди W-type", maximize("L_abc2", "entropy:AC", fixed={"c": 0.5},
+                                                                         require="W"))
+    _print("L_abc2: минимум энтропии кубита A", minimize("L_abc2", "entropy:A"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import itertools
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from sweep import FAMILIES, RESULT_COLUMNS as COLUMNS, analyze_batch
+
+
+# ленивая декартова сетка параметров: точки восстанавливаются по линейному индексу,
+# поэтому воркеру передаются только границы чанка, а не сами параметры
+class ParameterGrid:
+    def __init__(self, *axes):
+        self.axes = [np.asarray(ax, dtype=float) for ax in axes]
+        self.shape = tuple(len(ax) for ax in self.axes)
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    def points(self, start, stop):
+        idx = np.unravel_index(np.arange(start, stop), self.shape)
+        return np.stack([ax[i] for ax, i in zip(self.axes, idx)], axis=1)
+
+
+def _column_path(out_dir, name):
+    return os.path.join(out_dir, name + ".npy")
+
+
+# обработка одного чанка [start, stop) в процессе-воркере: результат пишется
+# прямо в memory-mapped колонки, назад возвращаются только границы
+def _run_chunk(family, grid, out_dir, start, stop, tol):
+    params_out = open_memmap(_column_path(out_dir, "parameters"), mode='r+')
+    if grid is not None:
+        params_out[start:stop] = grid.points(start, stop)
+    params = np.array(params_out[start:stop])
+
+    results = analyze_batch(FAMILIES[family](params), tol)
+    for name in COLUMNS:
+        column = open_memmap(_column_path(out_dir, name), mode='r+')
+        column[start:stop] = results[name]
+        column.flush()
+    params_out.flush()
+    return start, stop
+
+
+def _chunks(n_points, chunk_size):
+    for start in range(0, n_points, chunk_size):
+        yield start, min(start + chunk_size, n_points)
+
+
+# параллельный свип: params - ParameterGrid, массив (N, k) или итерируемое кортежей параметров
+# (для генератора нужно передать n_points). Результаты собираются в .npy файлах out_dir
+# в порядке точек сетки независимо от порядка завершения чанков.
+# workers=None - по числу ядер, workers=1 - без пула процессов
+def run_sweep(family, params, workers=None, chunk_size=65536, out_dir=None, n_points=None, tol=1e-9):
+    grid = params if isinstance(params, ParameterGrid) else None
+    n_params = len(grid.axes) if grid is not None else None
+    stream = None
+
+    if grid is not None:
+        n_points = len(grid)
+    elif isinstance(params, np.ndarray):
+        params = np.atleast_2d(params)
+        n_points, n_params = params.shape
+    else:
+        stream = iter(params)
+        if n_points is None:
+            params = np.atleast_2d(np.array(list(stream), dtype=float))
+            n_points, n_params = params.shape
+            stream = None
+        else:
+            first = np.asarray(next(stream), dtype=float)
+            n_params = len(first)
+            stream = itertools.chain([first], stream)
+
+    if out_dir is None:
+        out_dir = tempfile.mkdtemp(prefix=f"sweep_{family}_")
+    os.makedirs(out_dir, exist_ok=True)
+
+    open_memmap(_column_path(out_dir, "parameters"), mode='w+', dtype=np.float64, shape=(n_points, n_params))
+    for name, (shape, dtype) in COLUMNS.items():
+        open_memmap(_column_path(out_dir, name), mode='w+', dtype=dtype, shape=(n_points,) + shape)
+
+    # параметры из массива / генератора пишутся в общую колонку до отправки чанка воркеру
+    def prepare(start, stop):
+        if grid is not None:
+            return
+        params_out = open_memmap(_column_path(out_dir, "parameters"), mode='r+')
+        if stream is None:
+            params_out[start:stop] = params[start:stop]
+        else:
+            chunk = np.array(list(itertools.islice(stream, stop - start)), dtype=float)
+            params_out[start:stop] = chunk.reshape(stop - start, n_params)
+        params_out.flush()
+
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(n_points, chunk_size)
+    if workers == 1:
+        for start, stop in chunks:
+            prepare(start, stop)
+            _run_chunk(family, grid, out_dir, start, stop, tol)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # не больше двух чанков на воркер в очереди, чтобы генератор читался постепенно
+            pending = set()
+            for start, stop in chunks:
+                prepare(start, stop)
+                pending.add(pool.submit(_run_chunk, family, grid, out_dir, start, stop, tol))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in pending:
+                future.result()
+
+    return load_sweep(out_dir)
+
+
+# колонки готового свипа как memory-mapped массивы (только чтение)
+def load_sweep(out_dir):
+    names = ["parameters"] + list(COLUMNS)
+    return {name: np.load(_column_path(out_dir, name), mmap_mode='r') for name in names}
@@ -1,18 +1,53 @@
 import numpy as np
 
+# собственные числа ниже этого порога считаются нулём (шум округления eigenenergies())
+EIGENVALUE_TOL = 1e-12
+
+
+# маска валидности спектров (>=0 && sum=1) для стека (..., d) вдоль axis
+def validate_eigenvalues(sub_evals, axis=-1, tol=EIGENVALUE_TOL, sum_tol=1e-6):
+    evals = np.asarray(sub_evals, dtype=float)
+    non_negative = np.all(evals >= -tol, axis=axis)
+    normalized = np.abs(np.sum(evals, axis=axis) - 1) <= sum_tol
+    return non_negative & normalized
+
+
 def check_eigenvalues(sub_evals):
     print("проверка условий собственных значений (>=0 && sum=1):")
-    if any(ev < 0 for ev in sub_evals) or abs(sum(sub_evals) - 1) > 1e-6:
+    if not np.all(validate_eigenvalues(sub_evals)):
         print("ошибка в собственных значениях!")
     else:
         print("собственные значения верны!")
 
-def entropy(sub_evals):
-    res = 0
-    for ev in sub_evals:
-        if ev != 0:
-            res += ev * np.log2(ev)
-    if res != 0:
-        res *= -1
-    return res
-    
\ No newline at end of file
+
+# обнуление собственных чисел ниже tol (в том числе малых отрицательных); NaN сохраняется,
+# чтобы спектр невалидного состояния не выглядел чистым
+def _clip(sub_evals, tol):
+    evals = np.asarray(sub_evals, dtype=float)
+    return np.where((evals > tol) | np.isnan(evals), evals, 0.0)
+
+
+# энтропия фон Неймана (log2) для спектра или стека спектров (..., d) вдоль axis
+def entropy(sub_evals, axis=-1, tol=EIGENVALUE_TOL):
+    p = _clip(sub_evals, tol)
+    logs = np.log2(np.where(p > 0, p, 1.0))
+    return -np.sum(p * logs, axis=axis)[()] + 0.0
+
+
+# энтропия Реньи порядка alpha; alpha=1 - фон Нейман, alpha=0 - log2 ранга, alpha=inf - мин-энтропия
+def renyi_entropy(sub_evals, alpha, axis=-1, tol=EIGENVALUE_TOL):
+    if alpha == 1:
+        return entropy(sub_evals, axis, tol)
+    p = _clip(sub_evals, tol)
+    if alpha == 0:
+        rank = np.count_nonzero(p, axis=axis)
+        return np.where(np.isnan(p).any(axis=axis), np.nan, np.log2(rank))[()] + 0.0
+    if np.isinf(alpha):
+        return -np.log2(np.max(p, axis=axis))[()] + 0.0
+    return (np.log2(np.sum(p ** alpha, axis=axis)) / (1 - alpha))[()] + 0.0
+
+
+# линейная энтропия 1 - Tr(rho^2)
+def linear_entropy(sub_evals, axis=-1, tol=EIGENVALUE_TOL):
+    p = _clip(sub_evals, tol)
+    return (1 - np.sum(p ** 2, axis=axis))[()]
@@ -0,0 +1,175 @@
+import json
+import os
+
+import numpy as np
+
+from sweep import FAMILIES, PARAMETERS, RESULT_COLUMNS, analyze_batch
+
+MANIFEST = "manifest.json"
+
+
+# колонка хранилища: последовательность чанков .npy, открываемых лениво через mmap.
+# срез внутри одного чанка - представление memmap без копирования, через границу чанков - копия
+class ColumnView:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        shape, dtype = store.columns[name]
+        self.shape = (len(store),) + tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    def __len__(self):
+        return len(self.store)
+
+    def chunk(self, index):
+        return self.store._load(self.name, index)
+
+    def __getitem__(self, key):
+        offsets = self.store.offsets
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError(f"индекс {key} вне хранилища из {len(self)} точек")
+            index = np.searchsorted(offsets, key, side='right') - 1
+            return self.chunk(index)[key - offsets[index]]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                if start >= stop:
+                    return np.empty((0,) + self.shape[1:], dtype=self.dtype)
+                first = np.searchsorted(offsets, start, side='right') - 1
+                if 0 <= first and first + 1 < len(offsets) and stop <= offsets[first + 1]:
+                    return self.chunk(first)[start - offsets[first]:stop - offsets[first]]
+            key = np.arange(start, stop, step)
+        key = np.asarray(key)
+        if key.dtype == bool:
+            key = np.flatnonzero(key)
+        out = np.empty((len(key),) + self.shape[1:], dtype=self.dtype)
+        chunks = np.searchsorted(offsets, key, side='right') - 1
+        for index in np.unique(chunks):
+            selected = chunks == index
+            out[selected] = self.chunk(index)[key[selected] - offsets[index]]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[0:len(self)]
+        return np.asarray(values, dtype=dtype)
+
+
+# append-only столбцовое хранилище результатов свипа: каталог с manifest.json и
+# колонками фиксированного dtype, записанными чанками в <колонка>/<номер>.npy.
+# чтение ленивое (memory-mapped), поэтому постобработка не загружает всё в память
+class ResultStore:
+    def __init__(self, path, family=None):
+        self.path = path
+        self._cache = {}
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.family = manifest["family"]
+            self.columns = {name: (tuple(shape), dtype) for name, (shape, dtype) in manifest["columns"].items()}
+            self.chunk_sizes = manifest["chunks"]
+        else:
+            if family is None:
+                raise ValueError("для нового хранилища нужно указать семейство состояний")
+            self.family = family
+            self.columns = {"parameters": ((len(PARAMETERS[family]),), "float64")}
+            self.columns.update({name: (shape, np.dtype(dtype).str) for name, (shape, dtype) in RESULT_COLUMNS.items()})
+            self.chunk_sizes = []
+            os.makedirs(path, exist_ok=True)
+            self._write_manifest()
+
+    def __len__(self):
+        return int(sum(self.chunk_sizes))
+
+    def __getitem__(self, name):
+        return ColumnView(self, name)
+
+    @property
+    def offsets(self):
+        return np.concatenate([[0], np.cumsum(self.chunk_sizes, dtype=np.int64)])
+
+    def _chunk_path(self, name, index):
+        return os.path.join(self.path, name, f"{index:06d}.npy")
+
+    def _load(self, name, index):
+        key = (name, index)
+        if key not in self._cache:
+            self._cache[key] = np.load(self._chunk_path(name, index), mmap_mode='r')
+        return self._cache[key]
+
+    def _write_manifest(self):
+        manifest = {
+            "family": self.family,
+            "columns": {name: [list(shape), dtype] for name, (shape, dtype) in self.columns.items()},
+            "chunks": self.chunk_sizes
+        }
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    # дописать чанк: словарь массивов с ключами колонок (например, результат sweep.sweep);
+    # чанк становится видимым только после обновления манифеста
+    def append(self, results):
+        n = len(results["parameters"])
+        index = len(self.chunk_sizes)
+        for name, (shape, dtype) in self.columns.items():
+            values = np.asarray(results[name], dtype=dtype)
+            if values.shape != (n,) + tuple(shape):
+                raise ValueError(f"колонка {name}: форма {values.shape}, ожидалась {(n,) + tuple(shape)}")
+            os.makedirs(os.path.join(self.path, name), exist_ok=True)
+            np.save(self._chunk_path(name, index), values)
+        self.chunk_sizes.append(n)
+        self._write_manifest()
+
+    # проход по чанкам без склейки: словари memmap-массивов выбранных колонок
+    def iter_chunks(self, columns=None):
+        columns = columns or list(self.columns)
+        for index in range(len(self.chunk_sizes)):
+            yield {name: self._load(name, index) for name in columns}
+
+    # экспорт в Parquet (нужен pyarrow); многомерные колонки разворачиваются в name_0, name_1, ...
+    def to_parquet(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in self.iter_chunks():
+                arrays = {}
+                for name, values in chunk.items():
+                    values = np.asarray(values).reshape(len(values), -1)
+                    for k in range(values.shape[1]):
+                        column = values[:, k]
+                        suffix = f"_{k}" if values.shape[1] > 1 else ""
+                        if np.iscomplexobj(column):
+                            arrays[f"{name}{suffix}_re"] = column.real
+                            arrays[f"{name}{suffix}_im"] = column.imag
+                        else:
+                            arrays[f"{name}{suffix}"] = column
+                table = pa.table(arrays)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+# свип с записью в хранилище чанками: в памяти одновременно только один чанк.
+# params - массив (N, k) или parallel.ParameterGrid
+def sweep_to_store(store, params, chunk_size=65536, tol=1e-9):
+    build = FAMILIES[store.family]
+    for start in range(0, len(params), chunk_size):
+        stop = min(start + chunk_size, len(params))
+        if hasattr(params, 'points'):
+            chunk = params.points(start, stop)
+        else:
+            chunk = np.atleast_2d(np.asarray(params[start:stop], dtype=float))
+        results = analyze_batch(build(chunk), tol)
+        results["parameters"] = chunk
+        store.append(results)
+    return store
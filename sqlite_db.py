@@ -0,0 +1,188 @@
+import itertools
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS experiments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    description TEXT,
+    parameters TEXT,
+    status TEXT,
+    created_at TEXT,
+    results TEXT,
+    -- id записи в PostgreSQL после синхронизации (sync_sqlite.py)
+    synced_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS experiments_synced_idx ON experiments (synced_id);
+"""
+
+INSERT_QUERY = """
+    INSERT INTO experiments (name, description, parameters, status, created_at, results)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+# встроенное хранилище экспериментов в файле SQLite с тем же интерфейсом, что у ExperimentDB:
+# не нужен сервер, запись без сетевых round trip'ов. WAL-журнал позволяет читать файл во время
+# записи; commit_every > 1 объединяет одиночные записи в одну транзакцию
+class SQLiteExperimentDB:
+    def __init__(self, path='experiments.sqlite', commit_every=1):
+        self.path = path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _written(self, count=1):
+        self._uncommitted += count
+        if self._uncommitted >= self.commit_every:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    # сохранение информации о запуске эксперимента
+    def save_experiment(self, name, description, parameters):
+        try:
+            with self._lock, metrics.stage("db.execute.save_experiment"):
+                cursor = self._conn.execute(INSERT_QUERY, (
+                    name,
+                    description,
+                    json.dumps(parameters),
+                    'running',
+                    datetime.now().isoformat(),
+                    json.dumps({}),
+                ))
+                experiment_id = cursor.lastrowid
+                self._written()
+
+            print(f"Эксперимент сохранён в БД. ID: {experiment_id}")
+            return experiment_id
+
+        except Exception as e:
+            print(f"Ошибка сохранения эксперимента: {e}")
+            return None
+
+    # обновить статус эксперимента
+    def update_status(self, experiment_id, status, results=None):
+        try:
+            with self._lock, metrics.stage("db.execute.update_status"):
+                if results:
+                    self._conn.execute("UPDATE experiments SET status = ?, results = ? WHERE id = ?",
+                                       (status, json.dumps(results), experiment_id))
+                else:
+                    self._conn.execute("UPDATE experiments SET status = ? WHERE id = ?",
+                                       (status, experiment_id))
+                self._written()
+
+            print(f"Статус эксперимента {experiment_id} обновлён на '{status}'")
+
+        except Exception as e:
+            print(f"Ошибка обновления статуса: {e}")
+
+    # пакетная запись (parameters, results, status[, created_at]), одна транзакция на пакет
+    def save_experiments_bulk(self, records, name, description, batch_size=1000):
+        records = iter(records)
+        ids = []
+        try:
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                created_at = datetime.now().isoformat()
+                rows = [
+                    (name, description, json.dumps(parameters), status,
+                     str(rest[0]) if rest else created_at, json.dumps(results or {}))
+                    for parameters, results, status, *rest in batch
+                ]
+                # id батча попадают в ids только после commit: при откате их строк нет
+                batch_ids = []
+                with self._lock, metrics.stage("db.execute.bulk_insert"):
+                    with self._conn:
+                        for row in rows:
+                            batch_ids.append(self._conn.execute(INSERT_QUERY, row).lastrowid)
+                    self._uncommitted = 0
+                ids.extend(batch_ids)
+                metrics.count("db.rows_inserted", len(rows))
+
+            print(f"Сохранено экспериментов в БД: {len(ids)}")
+
+        except Exception as e:
+            print(f"Ошибка пакетного сохранения экспериментов: {e}")
+
+        return ids
+
+    # пакетное обновление статусов (experiment_id, status, results или None)
+    def update_status_bulk(self, updates, batch_size=1000):
+        updates = iter(updates)
+        updated = 0
+        try:
+            while True:
+                batch = list(itertools.islice(updates, batch_size))
+                if not batch:
+                    break
+                rows = [
+                    (status, json.dumps(results) if results else None, experiment_id)
+                    for experiment_id, status, results in batch
+                ]
+                with self._lock, metrics.stage("db.execute.bulk_update"):
+                    with self._conn:
+                        self._conn.executemany(
+                            "UPDATE experiments SET status = ?, results = COALESCE(?, results) WHERE id = ?", rows)
+                    self._uncommitted = 0
+                updated += len(rows)
+                metrics.count("db.rows_updated", len(rows))
+
+            print(f"Обновлено статусов экспериментов: {updated}")
+
+        except Exception as e:
+            print(f"Ошибка пакетного обновления статусов: {e}")
+
+        return updated
+
+    # ещё не перенесённые в PostgreSQL записи (по умолчанию только завершённые)
+    def unsynced_experiments(self, include_running=False, limit=None):
+        query = ("SELECT id, name, description, parameters, status, created_at, results "
+                 "FROM experiments WHERE synced_id IS NULL")
+        if not include_running:
+            query += " AND status != 'running'"
+        query += " ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query).fetchall()
+        return [
+            (row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], json.loads(row[6]))
+            for row in rows
+        ]
+
+    def mark_synced(self, pairs):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("UPDATE experiments SET synced_id = ? WHERE id = ?",
+                                       [(synced_id, local_id) for local_id, synced_id in pairs])
@@ -0,0 +1,354 @@
+import numpy as np
+
+import metrics
+from analytic import eigvals2_hermitian, negative_pt_eigenvalue, partial_transpose_b, ppt_det_test
+from families import REGISTRY
+from measures import density_measures, pure_measures
+from quantum_tools import entropy
+from symmetry import density_stabilizers, orbit_sources, stabilizers, symmetry_labels
+
+# пары кубитов в том же порядке, что и в main()
+SUBSYSTEMS = {
+    'AB': (0, 1),
+    'AC': (0, 2),
+    'AD': (0, 3),
+    'BC': (1, 2),
+    'BD': (1, 3),
+    'CD': (2, 3)
+}
+PAIR_NAMES = tuple(SUBSYSTEMS)
+
+# колонки результата анализа: имя -> (форма на одну точку, dtype)
+RESULT_COLUMNS = {
+    "amplitudes": ((16,), np.complex128),
+    "single_entropies": ((4,), np.float64),
+    "pair_entropies": ((6,), np.float64),
+    "pt_negative": ((6,), np.float64),
+    "entangled": ((6,), np.bool_),
+    "entangled_count": ((), np.int64),
+    "fully_separable": ((), np.bool_),
+    "classification": ((), np.int8),
+    "stabilizer": ((), np.int32)
+}
+
+# меры пар из measures.py (measures=True), выводятся в pairwise_entanglement
+_PAIR_MEASURES = ("negativity", "log_negativity", "concurrence")
+
+# коды классификации (строковые метки - classification_label)
+INVALID = -1
+FULLY_SEPARABLE = 0
+W_TYPE = 1
+GHZ_TYPE = 2
+
+_KET = 'abcd'
+_BRA = 'efgh'
+
+
+# батч-построители амплитуд и имена параметров всех зарегистрированных семейств
+FAMILIES = {name: family.amplitudes for name, family in REGISTRY.items()}
+PARAMETERS = {name: family.parameters for name, family in REGISTRY.items()}
+
+build_g_abcd_batch = FAMILIES["G_abcd"]
+build_l_abc2_batch = FAMILIES["L_abc2"]
+
+
+# все точки декартовой сетки по осям параметров -> (N, k)
+def grid_points(*axes):
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return np.stack([m.ravel() for m in mesh], axis=1)
+
+
+# |psi><psi| для батча: (N, 16) -> (N, 16, 16)
+def density_matrices(amps):
+    return np.einsum('ni,nj->nij', amps, amps.conj())
+
+
+# частичный след батча матриц плотности 4 кубитов, keep - оставляемые кубиты
+def ptrace_batch(rho, keep):
+    rho = rho.reshape((-1,) + (2,) * 8)
+    bra = ''.join(_BRA[q] if q in keep else _KET[q] for q in range(4))
+    out_ket = ''.join(_KET[q] for q in keep)
+    out_bra = ''.join(bra[q] for q in keep)
+    sub = np.einsum(f'n{_KET}{bra}->n{out_ket}{out_bra}', rho)
+    dim = 2 ** len(keep)
+    return sub.reshape(-1, dim, dim)
+
+
+# PPT критерий для батча пар (..., 4, 4) -> (entangled, pt_negative): знак det(rho^{T_B}), отрицательное собственное число -
+# аналитически; общий солвер только там, где det в пределах tol от нуля
+def ppt_pairs(pairs, tol):
+    entangled, uncertain, _ = ppt_det_test(pairs, tol)
+    pt_negative = np.zeros(entangled.shape)
+    if entangled.any():
+        pt_negative[entangled] = negative_pt_eigenvalue(pairs[entangled])
+    if uncertain.any():
+        min_evals = np.linalg.eigvalsh(partial_transpose_b(pairs[uncertain]))[..., 0]
+        entangled[uncertain] = min_evals < -tol
+        pt_negative[uncertain] = np.minimum(min_evals, 0.0)
+    return entangled, pt_negative
+
+
+# строковая метка классификации в формате main()
+def classification_label(code, entangled_count):
+    n_pairs = len(SUBSYSTEMS)
+    if code == INVALID:
+        return "invalid"
+    if code == FULLY_SEPARABLE:
+        return "fully_separable"
+    if code == W_TYPE:
+        return "W-type (все пары запутаны)"
+    return f"GHZ-type (запутаны {entangled_count}/{n_pairs} пар)"
+
+
+def _classify(single_entropies, entangled, tol):
+    fully_separable = np.all(np.abs(single_entropies) < tol, axis=1)
+    entangled_count = entangled.sum(axis=1)
+    classification = np.where(entangled_count == len(SUBSYSTEMS), W_TYPE, GHZ_TYPE)
+    classification = np.where(fully_separable, FULLY_SEPARABLE, classification)
+    return fully_separable, entangled_count, classification.astype(np.int8)
+
+
+def _spectrum_entropy(matrices):
+    return entropy(np.linalg.eigvalsh(matrices))
+
+
+def _spectrum2_entropy(matrices):
+    return entropy(eigvals2_hermitian(matrices))
+
+
+# source (N, k) - номера представителей орбит подсистем (symmetry.orbit_sources)
+def _representative(source):
+    return source == np.arange(source.shape[1])
+
+
+def _gather(values, source):
+    return values[np.arange(len(source))[:, None], source]
+
+
+# kernel по матрицам подсистем (N, k, d, d) только для представителей орбит перестановочной
+# симметрии, остальные подсистемы получают значения своего представителя. kernel возвращает
+# массив или кортеж массивов по подсистемам
+def _per_orbit(kernel, matrices, source):
+    representative = _representative(source)
+    if representative.all():
+        return kernel(matrices)
+    values = kernel(matrices[representative])
+    parts = values if isinstance(values, tuple) else (values,)
+    filled = []
+    for part in parts:
+        full = np.zeros(representative.shape + part.shape[1:], dtype=part.dtype)
+        full[representative] = part
+        filled.append(_gather(full, source))
+    return tuple(filled) if isinstance(values, tuple) else filled[0]
+
+
+# анализ батча матриц плотности (N, 16, 16) - всё теми же критериями, что и main();
+# measures=True добавляет количественные меры из measures.py (колонки MEASURE_COLUMNS)
+def analyze_density_batch(rho, tol=1e-9, measures=False):
+    with metrics.stage("analysis.symmetry"):
+        stabilizer = density_stabilizers(rho)
+        qubit_source, pair_source = orbit_sources(stabilizer)
+
+    with metrics.stage("analysis.single_spectra"):
+        singles = np.stack([ptrace_batch(rho, [q]) for q in range(4)], axis=1)
+        single_entropies = _per_orbit(_spectrum2_entropy, singles, qubit_source)
+
+    with metrics.stage("analysis.pair_spectra"):
+        pairs = np.stack([ptrace_batch(rho, list(idx)) for idx in SUBSYSTEMS.values()], axis=1)
+        pair_entropies = _per_orbit(_spectrum_entropy, pairs, pair_source)
+
+    # PPT критерий
+    with metrics.stage("analysis.ppt"):
+        entangled, pt_negative = _per_orbit(lambda p: ppt_pairs(p, tol), pairs, pair_source)
+
+    fully_separable, entangled_count, classification = _classify(single_entropies, entangled, tol)
+    results = {
+        "single_entropies": single_entropies,
+        "pair_entropies": pair_entropies,
+        "pt_negative": pt_negative,
+        "entangled": entangled,
+        "entangled_count": entangled_count,
+        "fully_separable": fully_separable,
+        "classification": classification,
+        "stabilizer": stabilizer
+    }
+    if measures:
+        with metrics.stage("analysis.measures"):
+            results.update(density_measures(pairs, pt_negative, entangled & _representative(pair_source)))
+            results["concurrence"] = _gather(results["concurrence"], pair_source)
+    return results
+
+
+# амплитуды (N, 16) как матрицы (N, 2^k, 2^(4-k)): строки - кубиты keep, столбцы - остальные
+def bipartition_matrices(amps, keep):
+    rest = [q for q in range(4) if q not in keep]
+    psi = amps.reshape((-1,) + (2,) * 4)
+    psi = psi.transpose([0] + [1 + q for q in keep] + [1 + q for q in rest])
+    return psi.reshape(len(amps), 2 ** len(keep), 2 ** len(rest))
+
+
+# матрицы бипартиции (пара | остальные) всех пар: (N, 6, 4, 4)
+def pair_bipartition_matrices(amps):
+    return np.stack([bipartition_matrices(amps, list(idx)) for idx in SUBSYSTEMS.values()], axis=1)
+
+
+# редуцированные матрицы всех пар (N, 6, 4, 4) для чистых состояний: M M^+ матриц бипартиции
+def pair_density_matrices(amps):
+    pair_m = pair_bipartition_matrices(amps)
+    return pair_m @ pair_m.conj().swapaxes(-1, -2)
+
+
+# анализ батча чистых состояний без матриц плотности 16x16:
+# спектр редуцированного состояния = квадраты сингулярных чисел матрицы бипартиции M,
+# они же собственные числа маленькой матрицы Грама M M^+ (batched eigvalsh быстрее svd).
+# меры (measures=True) используют уже построенные матрицы бипартиции и Грама
+def analyze_pure_batch(amps, tol=1e-9, measures=False):
+    with metrics.stage("analysis.symmetry"):
+        stabilizer = stabilizers(amps)
+        qubit_source, pair_source = orbit_sources(stabilizer)
+
+    with metrics.stage("analysis.single_spectra"):
+        singles = np.stack([bipartition_matrices(amps, [q]) for q in range(4)], axis=1)
+        singles = singles @ singles.conj().swapaxes(-1, -2)
+        single_entropies = _per_orbit(_spectrum2_entropy, singles, qubit_source)
+
+    with metrics.stage("analysis.pair_spectra"):
+        pair_m = pair_bipartition_matrices(amps)
+        pairs = pair_m @ pair_m.conj().swapaxes(-1, -2)
+        pair_entropies = _per_orbit(_spectrum_entropy, pairs, pair_source)
+
+    # PPT критерий
+    with metrics.stage("analysis.ppt"):
+        entangled, pt_negative = _per_orbit(lambda p: ppt_pairs(p, tol), pairs, pair_source)
+
+    fully_separable, entangled_count, classification = _classify(single_entropies, entangled, tol)
+    results = {
+        "single_entropies": single_entropies,
+        "pair_entropies": pair_entropies,
+        "pt_negative": pt_negative,
+        "entangled": entangled,
+        "entangled_count": entangled_count,
+        "fully_separable": fully_separable,
+        "classification": classification,
+        "stabilizer": stabilizer
+    }
+    if measures:
+        with metrics.stage("analysis.measures"):
+            results.update(pure_measures(amps, pair_m, singles, pt_negative, entangled & _representative(pair_source)))
+            results["concurrence"] = _gather(results["concurrence"], pair_source)
+    return results
+
+
+# анализ батча состояний: векторы (N, 16) идут по быстрому пути чистых состояний,
+# матрицы плотности (N, 16, 16) - по общему пути; mode='density' форсирует общий путь.
+# measures=True - дополнительно негативность, конкуренция, tangle и инварианты (measures.py)
+def analyze_batch(states, tol=1e-9, mode='auto', measures=False):
+    states = np.asarray(states, dtype=complex)
+    if states.ndim == 3:
+        valid = np.all(np.isfinite(states), axis=(1, 2)) & (np.trace(states, axis1=1, axis2=2).real > 0)
+        if valid.all():
+            return analyze_density_batch(states, tol, measures)
+        return _scatter_valid(analyze_density_batch(states[valid], tol, measures), valid)
+    amps = np.atleast_2d(states)
+    metrics.count("analysis.states", len(amps))
+    # нулевой вектор не задаёт состояния: INVALID, как и нечисловые амплитуды
+    valid = np.all(np.isfinite(amps), axis=1) & np.any(amps != 0, axis=1)
+    analyze = analyze_density_batch if mode == 'density' else analyze_pure_batch
+    prepare = density_matrices if mode == 'density' else np.asarray
+    if valid.all():
+        results = analyze(prepare(amps), tol, measures)
+    else:
+        results = _scatter_valid(analyze(prepare(amps[valid]), tol, measures), valid)
+    results["amplitudes"] = amps
+    return results
+
+
+# результаты для валидных точек -> полный батч; невалидные: NaN / False / INVALID
+def _scatter_valid(results, valid):
+    full = {}
+    for key, values in results.items():
+        if values.dtype.kind == 'f':
+            fill = np.nan
+        elif values.dtype.kind == 'c':
+            fill = complex(np.nan, np.nan)
+        elif values.dtype.kind == 'b':
+            fill = False
+        elif key == "stabilizer":
+            fill = 0
+        else:
+            fill = INVALID
+        column = np.full((len(valid),) + values.shape[1:], fill, dtype=values.dtype)
+        column[valid] = values
+        full[key] = column
+    return full
+
+
+# анализ одного состояния (Qobj или массив): кет - путь чистых состояний, иначе - матрица плотности
+def analyze_state(state, tol=1e-9):
+    if hasattr(state, 'full'):
+        state = state.full()
+    state = np.asarray(state, dtype=complex)
+    if state.shape == (16, 16):
+        return analyze_batch(state[None], tol)
+    return analyze_batch(state.ravel(), tol)
+
+
+# NaN невалидных точек -> null: jsonb PostgreSQL не принимает NaN
+def _json_number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+# результаты одной точки батча в формате словаря results из main();
+# меры (если батч посчитан с measures=True) - в парах и отдельным разделом "measures"
+def point_results(batch, i):
+    pairwise_results = {}
+    for k, name in enumerate(PAIR_NAMES):
+        is_entangled = bool(batch["entangled"][i, k])
+        # у частично транспонированной матрицы пары не больше одного отрицательного собственного числа
+        pt_negative = [_json_number(batch["pt_negative"][i, k])] if is_entangled else []
+        pairwise_results[name] = {
+            "entropy": _json_number(batch["pair_entropies"][i, k]),
+            "entangled": is_entangled,
+            "pt_negative_eigenvalues": pt_negative
+        }
+        for key in _PAIR_MEASURES:
+            if key in batch:
+                pairwise_results[name][key] = _json_number(batch[key][i, k])
+    entangled_count = int(batch["entangled_count"][i])
+    results = {
+        "single_entropies": [_json_number(s) for s in batch["single_entropies"][i]],
+        "pairwise_entanglement": pairwise_results,
+        "classification": classification_label(batch["classification"][i], entangled_count),
+        "entangled_count": entangled_count
+    }
+    if "stabilizer" in batch:
+        # группа перестановок кубитов, оставляющих состояние неизменным ("BACD" - обмен A и B)
+        results["symmetry"] = symmetry_labels(batch["stabilizer"][i])
+    if "four_tangle" in batch:
+        # комплексные инварианты L, M, N - парами [re, im] (JSON)
+        results["measures"] = {
+            "one_tangles": [_json_number(t) for t in batch["one_tangles"][i]],
+            "four_tangle": _json_number(batch["four_tangle"][i]),
+            "invariants": [[_json_number(v.real), _json_number(v.imag)] for v in batch["invariants"][i]]
+        }
+    return results
+
+
+def _concat(parts):
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+# свип по массиву параметров (N, k) для семейства family
+# chunk_size ограничивает память под промежуточные массивы батча
+def sweep(family, params, tol=1e-9, chunk_size=16384, mode='auto', measures=False):
+    build = FAMILIES[family]
+    params = np.atleast_2d(np.asarray(params))
+    parts = []
+    for start in range(0, len(params), chunk_size):
+        with metrics.stage("sweep.build"):
+            amps = build(params[start:start + chunk_size])
+        parts.append(analyze_batch(amps, tol, mode, measures))
+    results = _concat(parts)
+    results["parameters"] = params
+    return results
@@ -0,0 +1,107 @@
+import itertools
+
+import numpy as np
+
+# стабилизатор состояния в группе перестановок 4 кубитов (S4, 24 элемента), определяемый прямо
+# по амплитудам: перестановка кубитов - это перестановка индексов базиса, и состояние инвариантно,
+# если амплитуды совпадают после неё. Группа хранится битовой маской (бит k - PERMUTATIONS[k]).
+# Для симметричного состояния редуцированные матрицы кубитов (пар) одной орбиты совпадают
+# с точностью до перестановки кубитов внутри пары, так что спектры и PPT считаются по одному
+# представителю орбиты
+
+LETTERS = "ABCD"
+PERMUTATIONS = list(itertools.permutations(range(4)))
+IDENTITY = 1
+
+# пары кубитов в порядке sweep.SUBSYSTEMS (AB, AC, AD, BC, BD, CD)
+PAIRS = list(itertools.combinations(range(4), 2))
+
+# амплитуды после перестановки: new[i] = old[_INDEX_MAPS[k, i]], новый кубит q - старый perm[q]
+_INDEX_MAPS = np.array([np.arange(16).reshape(2, 2, 2, 2).transpose(perm).ravel() for perm in PERMUTATIONS])
+
+# амплитуды нормированы; совпадение в пределах округления, а не tol анализа - значения
+# представителя подставляются в остальные подсистемы орбиты как есть
+SYMMETRY_TOL = 1e-12
+
+_PAIR_INDEX = {pair: k for k, pair in enumerate(PAIRS)}
+_PAIR_MAPS = np.array([[_PAIR_INDEX[tuple(sorted((perm[i], perm[j])))] for i, j in PAIRS] for perm in PERMUTATIONS])
+
+_ORBITS = {}
+
+
+# пробный вектор для быстрого отсева: у инвариантного состояния свёртка переставленных амплитуд
+# с ним совпадает с исходной. _PROBES[:, k] - пробный вектор, переставленный обратно, так что
+# свёртки со всеми 24 перестановками - одно матричное произведение amps @ _PROBES
+_PROBE = np.random.default_rng(2024).uniform(0.5, 1.5, 16)
+_PROBES = np.zeros((16, len(PERMUTATIONS)))
+_PROBES[_INDEX_MAPS.T, np.arange(len(PERMUTATIONS))] = _PROBE[:, None]
+
+
+# кандидаты (N, 24) по свёрткам h (N, 24) -> точная проверка только их
+def _collect(candidates, fixed):
+    mask = np.full(len(candidates), IDENTITY, dtype=np.int32)
+    for k in range(1, len(PERMUTATIONS)):
+        rows = np.flatnonzero(candidates[:, k])
+        if len(rows):
+            mask[rows[fixed(rows, _INDEX_MAPS[k])]] |= 1 << k
+    return mask
+
+
+# стабилизаторы батча амплитуд (N, 16): маска (N,) int32
+def stabilizers(amps, tol=SYMMETRY_TOL):
+    h = amps @ _PROBES
+    candidates = np.abs(h - h[:, :1]) <= tol * _PROBE.sum()
+
+    def fixed(rows, index):
+        sub = amps[rows]
+        return np.all(np.abs(sub[:, index] - sub) <= tol, axis=1)
+
+    return _collect(candidates, fixed)
+
+
+# то же для матриц плотности (N, 16, 16): rho инвариантна относительно P rho P^T
+def density_stabilizers(rho, tol=SYMMETRY_TOL):
+    h = np.einsum('nij,ik,jk->nk', rho, _PROBES, _PROBES, optimize=True)
+    candidates = np.abs(h - h[:, :1]) <= tol * _PROBE.sum() ** 2
+
+    def fixed(rows, index):
+        sub = rho[rows]
+        return np.all(np.abs(sub[:, index][:, :, index] - sub) <= tol, axis=(1, 2))
+
+    return _collect(candidates, fixed)
+
+
+# элементы группы по маске
+def group(mask):
+    return [perm for k, perm in enumerate(PERMUTATIONS) if int(mask) >> k & 1]
+
+
+# перестановка как новый порядок кубитов: (1, 0, 2, 3) -> "BACD"
+def permutation_label(perm):
+    return "".join(LETTERS[q] for q in perm)
+
+
+def symmetry_labels(mask):
+    return [permutation_label(perm) for perm in group(mask)]
+
+
+# представители орбит кубитов и пар для одной группы: (4,), (6,) - наименьший номер в орбите
+def _orbit_representatives(mask):
+    if mask not in _ORBITS:
+        members = [k for k in range(len(PERMUTATIONS)) if mask >> k & 1]
+        qubits = np.min(np.array(PERMUTATIONS)[members], axis=0)
+        pairs = np.min(_PAIR_MAPS[members], axis=0)
+        _ORBITS[mask] = (qubits, pairs)
+    return _ORBITS[mask]
+
+
+# для каждой точки и подсистемы - номер подсистемы-представителя её орбиты:
+# (N, 4) для кубитов и (N, 6) для пар; у точки без симметрий - сама подсистема
+def orbit_sources(stabilizer):
+    masks, inverse = np.unique(stabilizer, return_inverse=True)
+    qubits = np.empty((len(masks), 4), dtype=np.intp)
+    pairs = np.empty((len(masks), len(PAIRS)), dtype=np.intp)
+    for k, mask in enumerate(masks.tolist()):
+        qubits[k], pairs[k] = _orbit_representatives(mask)
+    inverse = inverse.ravel()
+    return qubits[inverse], pairs[inverse]
@@ -0,0 +1,45 @@
+import argparse
+from itertools import groupby
+
+from database import ExperimentDB
+from sqlite_db import SQLiteExperimentDB
+
+
+# перенос записей из файла SQLite в PostgreSQL пакетами; уже перенесённые помечаются synced_id,
+# поэтому повторный запуск продолжает с места остановки
+def sync(sqlite_db, pg_db, batch_size=1000, include_running=False):
+    total = 0
+    while True:
+        rows = sqlite_db.unsynced_experiments(include_running, limit=batch_size)
+        if not rows:
+            break
+        synced = []
+        for (name, description), group in groupby(rows, key=lambda row: (row[1], row[2])):
+            group = list(group)
+            records = [(parameters, results, status, created_at)
+                       for _, _, _, parameters, status, created_at, results in group]
+            ids = pg_db.save_experiments_bulk(records, name, description, batch_size)
+            synced.extend(zip([row[0] for row in group], ids))
+            if len(ids) < len(group):
+                sqlite_db.mark_synced(synced)
+                raise RuntimeError("синхронизация прервана: не все записи сохранены в PostgreSQL")
+        sqlite_db.mark_synced(synced)
+        total += len(synced)
+    print(f"Перенесено записей из SQLite в PostgreSQL: {total}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="перенос экспериментов из SQLite в PostgreSQL")
+    parser.add_argument("sqlite_path")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--include-running", action="store_true",
+                        help="переносить и незавершённые эксперименты")
+    args = parser.parse_args()
+
+    with SQLiteExperimentDB(args.sqlite_path) as sqlite_db, ExperimentDB() as pg_db:
+        sync(sqlite_db, pg_db, args.batch_size, args.include_running)
+
+
+if __name__ == "__main__":
+    main()
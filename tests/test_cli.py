@@ -0,0 +1,17 @@
+import io
+
+from cli import process_stream, read_parameters
+
+
+# ошибка разбора строки CSV не обрывает чтение: следующие строки обрабатываются
+def test_csv_rows_after_bad_row():
+    lines = ["a,b,c,d\n", "1,0,0,0\n", "1,0\n", "1,x,0,0\n", "0,1,0,0\n", "1,1,0,0\n"]
+    rows = list(read_parameters(lines, "abcd", fmt="csv"))
+    assert [number for number, params in rows if isinstance(params, Exception)] == [3, 4]
+    assert [params for _, params in rows if not isinstance(params, Exception)] == [
+        [1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [1.0, 1.0, 0.0, 0.0]]
+
+    out, errors = io.StringIO(), io.StringIO()
+    assert process_stream("G_abcd", lines, out, fmt="csv", errors=errors) == (3, 2)
+    assert len(out.getvalue().splitlines()) == 3
+    assert len(errors.getvalue().splitlines()) == 2
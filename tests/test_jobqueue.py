@@ -0,0 +1,128 @@
+import time
+
+import numpy as np
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import jobqueue
+from database import ExperimentDB
+from parallel import ParameterGrid
+
+# тесты очереди на локальном PostgreSQL (параметры подключения - как у ExperimentDB: QUANTUM_DB_*).
+# каждая проверка работает в своей схеме, созданной миграциями с нуля, и удаляет её после себя
+SCHEMA = "jobqueue_test"
+
+
+@pytest.fixture
+def db():
+    admin = ExperimentDB()
+    try:
+        with admin.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    except psycopg2.OperationalError as e:
+        admin.close()
+        pytest.skip(f"PostgreSQL недоступен: {e}")
+    queue_db = ExperimentDB(options=f"-csearch_path={SCHEMA}")
+    queue_db.migrate()
+    yield queue_db
+    queue_db.close()
+    with admin.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    admin.close()
+
+
+def _fetch(db, query, args=()):
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute(query, args)
+        return cursor.fetchall()
+
+
+def test_enqueue_grid_chunks(db):
+    grid = ParameterGrid(np.linspace(-1, 1, 5), np.linspace(-1, 1, 5), [0.5], [0.0])
+    assert jobqueue.enqueue(db, "s", "G_abcd", grid, chunk_size=10) == 3
+    rows = _fetch(db, "SELECT parameters, points, status FROM jobs ORDER BY id")
+    assert [points for _, points, _ in rows] == [10, 10, 5]
+    assert {status for _, _, status in rows} == {"pending"}
+    points = np.concatenate([jobqueue.job_points(description) for description, _, _ in rows])
+    assert np.array_equal(points, grid.points(0, len(grid)))
+
+
+# захваченное (заблокированное) задание другие воркеры пропускают, а не ждут
+def test_claim_skips_locked(db):
+    jobqueue.enqueue(db, "s", "G_abcd", [[1, 0, 0, 0], [0, 1, 0, 0]], chunk_size=1)
+    with db.connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT id FROM jobs ORDER BY id LIMIT 1 FOR UPDATE")
+        locked = cursor.fetchone()[0]
+        job = jobqueue.Worker(db, "s", name="w1").claim()
+        assert job is not None and job[0] != locked
+    assert jobqueue.Worker(db, "s", name="w2").claim()[0] == locked
+    assert jobqueue.Worker(db, "s", name="w3").claim() is None
+
+
+# точка с нулевой нормой (начало координат G_abcd) сохраняется с null вместо NaN, задание завершается
+def test_complete_stores_points(db):
+    grid = ParameterGrid([-1.0, 0.0, 1.0], [-1.0, 0.0, 1.0], [0.0], [0.0])
+    jobqueue.enqueue(db, "s", "G_abcd", grid, chunk_size=len(grid))
+    worker = jobqueue.Worker(db, "s", name="w1")
+    assert worker.run() == 1
+
+    (status, attempts, summary), = _fetch(db, "SELECT status, attempts, results FROM jobs")
+    assert (status, attempts) == ("completed", 1)
+    assert sum(summary.values()) == len(grid) and summary["invalid"] == 1
+    rows = _fetch(db, "SELECT parameters, results FROM experiments ORDER BY id")
+    assert len(rows) == len(grid)
+    invalid = [results for parameters, results in rows if parameters["a"] == parameters["b"] == 0]
+    assert invalid[0]["classification"] == "invalid"
+    assert invalid[0]["single_entropies"] == [None] * 4
+    assert jobqueue.sweep_summary(db, "s") == summary
+    assert jobqueue.progress(db, "s")["finished"]
+
+
+def test_heartbeat(db):
+    jobqueue.enqueue(db, "s", "G_abcd", [[1, 0, 0, 0]])
+    worker = jobqueue.Worker(db, "s", name="w1", heartbeat=0.05)
+    job_id = worker.claim()[0]
+    _fetch(db, "UPDATE jobs SET heartbeat_at = now() - interval '1 hour' RETURNING id")
+    worker.current.add(job_id)
+    beat = jobqueue.threading.Thread(target=worker._beat, daemon=True)
+    beat.start()
+    time.sleep(0.3)
+    worker._stop.set()
+    beat.join()
+    (age,), = _fetch(db, "SELECT EXTRACT(EPOCH FROM now() - heartbeat_at) FROM jobs")
+    assert age < 60
+
+
+# брошенное задание возвращается в очередь; опоздавший воркер не пишет результаты
+def test_requeue_stale(db):
+    jobqueue.enqueue(db, "s", "G_abcd", [[1, 0.5, 0, 0], [0.5, 0.5, 0.5, 0.5]])
+    slow = jobqueue.Worker(db, "s", name="slow")
+    job = slow.claim()
+    _fetch(db, "UPDATE jobs SET heartbeat_at = now() - interval '1 hour' RETURNING id")
+    assert jobqueue.requeue_stale(db, timeout=60) == [job[0]]
+    assert _fetch(db, "SELECT status, worker FROM jobs") == [("pending", None)]
+
+    fast = jobqueue.Worker(db, "s", name="fast")
+    assert fast.claim()[0] == job[0]
+    with pytest.raises(jobqueue.LostClaim):
+        slow.process(*job[:4])
+    assert _fetch(db, "SELECT COUNT(*) FROM experiments") == [(0,)]
+    fast.process(*job[:4])
+    assert _fetch(db, "SELECT status, attempts, worker FROM jobs") == [("completed", 2, "fast")]
+    assert _fetch(db, "SELECT COUNT(*) FROM experiments") == [(2,)]
+
+
+def test_failed_after_max_attempts(db):
+    jobqueue.enqueue(db, "s", "G_abcd", [[1, 0, 0, 0]])
+    worker = jobqueue.Worker(db, "s", name="w1", max_attempts=2)
+
+    def broken(*args):
+        raise RuntimeError("сбой")
+
+    worker.process = broken
+    assert worker.run() == 0
+    (status, attempts, error), = _fetch(db, "SELECT status, attempts, error FROM jobs")
+    assert (status, attempts, error) == ("failed", 2, "сбой")
+    assert jobqueue.progress(db, "s")["jobs"]["failed"] == 1
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from result_store import ResultStore
+from sweep import sweep
+
+
+def test_empty_slices_and_bounds(tmp_path):
+    store = ResultStore(str(tmp_path / "store"), "G_abcd")
+    assert np.asarray(store["entangled"]).shape == (0, 6)
+
+    params = np.random.default_rng(0).uniform(-1, 1, (8, 4))
+    store.append(sweep("G_abcd", params))
+    column = store["entangled"]
+    assert column[len(store):len(store)].shape == (0, 6)
+    assert np.array_equal(column[-1], column[len(store) - 1])
+    with pytest.raises(IndexError):
+        column[len(store)]
+    with pytest.raises(IndexError):
+        column[-len(store) - 1]
@@ -0,0 +1,7 @@
+import bench
+
+
+# короткий запуск на бэкенде numpy укладывается в DEFAULT_STARTUP_LIMIT и не тянет qutip/scipy/matplotlib/psycopg2
+def test_startup_within_budget():
+    seconds, problems = bench.check_startup()
+    assert not problems, "; ".join(problems)
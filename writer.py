@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# служебные сообщения очереди
+_STOP = object()
+
+
+# эксперимент, поставленный в очередь на запись; id появляется после сохранения пакета
+class PendingExperiment:
+    def __init__(self, name, description, parameters):
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.id = None
+        self._stored = threading.Event()
+
+    # ждать, пока запись попадёт в БД (или окончательно не удастся); возвращает id или None
+    def wait(self, timeout=None):
+        self._stored.wait(timeout)
+        return self.id
+
+
+# фоновая запись в БД: вычисления кладут записи в ограниченную очередь, поток-писатель
+# собирает их в пакеты (по batch_size или раз в flush_interval секунд) и пишет через
+# save_experiments_bulk / update_status_bulk. Статусы те же: 'running' -> 'completed'/'failed';
+# если эксперимент успел завершиться до сброса пакета, строка сразу вставляется с итоговым статусом
+class BackgroundWriter:
+    def __init__(self, db, batch_size=1000, flush_interval=1.0, maxsize=10000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="experiment-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # регистрация запуска эксперимента (status='running'), не блокирует вычисления
+    def start(self, name, description, parameters):
+        experiment = PendingExperiment(name, description, parameters)
+        self._queue.put(('start', experiment, None, None))
+        return experiment
+
+    # итоговый статус эксперимента
+    def finish(self, experiment, status, results=None):
+        self._queue.put(('finish', experiment, status, results))
+
+    # принудительный сброс накопленного; блокирует до записи
+    def flush(self):
+        done = threading.Event()
+        self._queue.put(('flush', done, None, None))
+        done.wait()
+
+    # дописать всё из очереди и остановить поток
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        buffer = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(buffer)
+                return
+            if item is not None and item[0] == 'flush':
+                self._flush(buffer)
+                buffer = []
+                deadline = None
+                item[1].set()
+                continue
+            if item is not None:
+                buffer.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(buffer) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                self._flush(buffer)
+                buffer = []
+                deadline = None
+
+    # один сброс: вставка новых экспериментов (сгруппированных по name/description)
+    # и пакетное обновление статусов уже сохранённых
+    def _flush(self, buffer):
+        if not buffer:
+            return
+        try:
+            started = OrderedDict()
+            final = {}
+            for op, experiment, status, results in buffer:
+                if op == 'start':
+                    started[experiment] = None
+                else:
+                    final[experiment] = (status, results)
+
+            groups = OrderedDict()
+            for experiment in started:
+                groups.setdefault((experiment.name, experiment.description), []).append(experiment)
+            for (name, description), experiments in groups.items():
+                records = []
+                for experiment in experiments:
+                    status, results = final.pop(experiment, ('running', None))
+                    records.append((experiment.parameters, results, status))
+                ids = self.db.save_experiments_bulk(records, name, description, self.batch_size)
+                for experiment, experiment_id in zip(experiments, ids):
+                    experiment.id = experiment_id
+
+            updates = [
+                (experiment.id, status, results)
+                for experiment, (status, results) in final.items()
+                if experiment.id is not None
+            ]
+            if updates:
+                self.db.update_status_bulk(updates, self.batch_size)
+
+        except Exception as e:
+            print(f"Ошибка фоновой записи в БД: {e}")
+
+        finally:
+            for op, experiment, _, _ in buffer:
+                if op == 'start':
+                    experiment._stored.set()